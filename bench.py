@@ -0,0 +1,452 @@
+"""
+Stoic Quote Bot - Offline Load Test
+
+Drives the real command handlers in main.py without a Discord connection or
+network access:
+
+- A mock stoic-quotes API on localhost serves a synthetic corpus, which is
+  ingested through the bot's own streaming fetch path.
+- A fake gateway feeds messages through py-cord's prefix parsing, the global
+  throttle check, the command handlers and the outbound scheduler.
+- A fake HTTP layer stands in for Discord's REST API: it serializes each
+  reply like a real send would and answers after an optional delay.
+
+For each command it reports throughput, p50/p99 latency and memory allocated
+per invocation, and it times !persona name resolution on its own. Results can
+be saved and compared against a baseline, so CI can fail on performance
+regressions.
+
+Usage:
+    python bench.py
+    python bench.py --commands quote,search --concurrency 200 --users 50000
+    python bench.py --save bench-baseline.json
+    python bench.py --compare bench-baseline.json   # exits 1 on regression
+"""
+
+import os
+import sys
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+# main.py reads its settings at import time, so point its state at a scratch directory first
+BENCH_DIR = tempfile.mkdtemp(prefix="stoic-bench-")
+os.environ["STATE_STORE_URL"] = f"sqlite:///{BENCH_DIR}/state.db"
+os.environ["QUOTE_SNAPSHOT_PATH"] = f"{BENCH_DIR}/quotes.snapshot"
+os.environ["QUOTE_SOURCES"] = "api"
+os.environ["QUOTE_API_PAGES"] = "1"
+os.environ.pop("METRICS_PORT", None)
+
+import main  # noqa: E402
+from aiohttp import web  # noqa: E402
+from discord.ext import commands  # noqa: E402
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Message content sent for each benchmarked command ({persona} is filled per message)
+COMMAND_MESSAGES = {
+    "quote": "quote",
+    "random": "random",
+    "authors": "authors",
+    "persona": "persona {persona}",
+    "bio": "bio",
+    "help": "help",
+    "search": "search anger and fear of death",
+    "ping": "ping",
+    "info": "info",
+}
+
+# Words the synthetic corpus is built from (the first few are common !search topics)
+VOCABULARY = (
+    "death anger fear virtue fortune mind soul nature reason time life wealth pain pleasure "
+    "wisdom body friend enemy duty patience courage justice freedom desire judgment present "
+    "future past control will habit silence truth honor"
+).split()
+FILLER = "the a of to and is in that we our it not be what".split()
+
+PERSONA_QUERIES = ("marcus", "sen", "epictetus", "aurelius", "Seneca", "epic")
+
+# PersonaResolver lookups timed directly, by kind of match
+RESOLVER_QUERIES = {
+    "exact": ("marcus", "Seneca", "epictetus", "marcus aurelius"),
+    "prefix": ("sen", "epic", "aurel", "marc"),
+    "fuzzy": ("senica", "epictetos", "marcos aurelios"),
+}
+
+# Regression thresholds for --compare: relative change, and the smallest p99 change (ms) that counts
+DEFAULT_TOLERANCE = 0.3
+MIN_P99_DELTA_MS = 0.2
+MIN_RESOLVER_DELTA_NS = 100
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MOCK QUOTE API
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def synthetic_corpus(count: int, authors: int, seed: int) -> list[dict]:
+    """Generate `count` distinct quote records spread over the known and extra authors."""
+    rng = random.Random(seed)
+    names = list(main.AUTHOR_BIOS) + [f"Philosopher {i}" for i in range(max(0, authors - len(main.AUTHOR_BIOS)))]
+    records = []
+    for i in range(count):
+        words = [rng.choice(VOCABULARY if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(8, 40))]
+        records.append({"text": f"{' '.join(words).capitalize()} ({i}).", "author": names[i % len(names)]})
+    return records
+
+
+async def start_mock_api(records: list[dict], chunk_size: int = 8192) -> tuple[web.AppRunner, str]:
+    """Serve `records` as a JSON array in small chunks, like a large streamed API response."""
+    body = json.dumps(records).encode("utf-8")
+    etag = f'"{len(records)}"'
+
+    async def handle_quotes(request: web.Request) -> web.StreamResponse:
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        response = web.StreamResponse(headers={"Content-Type": "application/json", "ETag": etag})
+        await response.prepare(request)
+        for start in range(0, len(body), chunk_size):
+            await response.write(body[start:start + chunk_size])
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/api/quotes", handle_quotes)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/api/quotes"
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FAKE GATEWAY AND HTTP
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class FakeHTTP:
+    """Stands in for Discord's REST API: serializes each message payload and answers after `latency`."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sent = 0
+        self.bytes = 0
+
+    async def send_message(self, channel_id: int, content: str | None, embed) -> SimpleNamespace:
+        payload = {"content": content, "embeds": [embed.to_dict()] if embed is not None else []}
+        self.bytes += len(json.dumps(payload, ensure_ascii=False))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            await asyncio.sleep(0)
+        self.sent += 1
+        return SimpleNamespace(id=self.sent, channel_id=channel_id, content=content)
+
+
+class BenchContext(commands.Context):
+    """Invocation context whose replies go to the fake HTTP layer instead of Discord."""
+
+    http: FakeHTTP
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        return await self.http.send_message(self.channel.id, content, embed)
+
+
+class FakeGateway:
+    """Turns (user, guild) pairs into MESSAGE_CREATE-like messages and dispatches them to the bot."""
+
+    def __init__(self, users: int, guilds: int, seed: int):
+        self.rng = random.Random(seed)
+        self.users = [SimpleNamespace(id=10_000_000 + i, bot=False) for i in range(users)]
+        self.guilds = [SimpleNamespace(id=20_000_000 + i, shard_id=0) for i in range(guilds)]
+        self.channels = [SimpleNamespace(id=30_000_000 + i) for i in range(guilds)]
+        self.state = main.bot._connection
+        self.message_id = 0
+
+        # get_context skips messages from the bot itself, so it needs to know who that is
+        self.state.user = SimpleNamespace(id=1, bot=True)
+
+    def message(self, template: str) -> SimpleNamespace:
+        """A random user's message in one of their guild's channels."""
+        user = self.rng.choice(self.users)
+        guild_index = user.id % len(self.guilds)
+        self.message_id += 1
+        content = main.bot.command_prefix + template.format(persona=self.rng.choice(PERSONA_QUERIES))
+        return SimpleNamespace(
+            id=self.message_id, content=content, author=user,
+            guild=self.guilds[guild_index], channel=self.channels[guild_index], _state=self.state,
+        )
+
+    async def dispatch(self, message) -> None:
+        """Run one message through prefix parsing, checks and the command handler."""
+        ctx = await main.bot.get_context(message, cls=BenchContext)
+        await main.bot.invoke(ctx)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def error_count(command: str) -> float:
+    return sum(v for (name, _), v in main.command_errors_total.values.items() if name == command)
+
+
+async def run_load(gateway: FakeGateway, template: str, operations: int, concurrency: int) -> tuple[list[float], float]:
+    """Dispatch `operations` messages from `concurrency` workers. Returns (latencies, wall seconds)."""
+    remaining = operations
+    latencies: list[float] = []
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            message = gateway.message(template)
+            started = time.perf_counter()
+            await gateway.dispatch(message)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+async def measure_allocations(gateway: FakeGateway, template: str, samples: int) -> tuple[float, float]:
+    """Average (peak bytes allocated, bytes still held) per invocation, measured one at a time."""
+    peak_total = retained_total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            message = gateway.message(template)
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await gateway.dispatch(message)
+            current, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - before
+            retained_total += current - before
+    finally:
+        tracemalloc.stop()
+    return peak_total / samples, retained_total / samples
+
+
+async def benchmark_command(gateway: FakeGateway, command: str, args) -> dict:
+    template = COMMAND_MESSAGES[command]
+    await run_load(gateway, template, args.warmup, args.concurrency)
+
+    errors_before = error_count(command)
+    sent_before = BenchContext.http.sent
+    latencies, elapsed = await run_load(gateway, template, args.operations, args.concurrency)
+    await asyncio.sleep(0)  # let error handlers dispatched as tasks run
+    errors = error_count(command) - errors_before
+    replies = BenchContext.http.sent - sent_before
+
+    peak, retained = await measure_allocations(gateway, template, args.alloc_samples)
+    latencies.sort()
+    return {
+        "operations": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": 1000 * percentile(latencies, 0.50),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+        "max_ms": 1000 * latencies[-1],
+        "alloc_kib": peak / 1024,
+        "retained_bytes": retained,
+        "replies": replies,
+        "errors": errors,
+    }
+
+
+def benchmark_resolver(iterations: int, repeats: int = 5, budget: float = 0.2) -> dict:
+    """Time PersonaResolver.resolve by kind of match: best-of-`repeats` nanoseconds per lookup.
+
+    Each repeat runs up to `iterations` lookups, or fewer if they would take
+    longer than `budget` seconds (fuzzy matches are orders of magnitude slower).
+    """
+    resolve = main.quote_index.resolver.resolve
+    results = {}
+    for kind, queries in RESOLVER_QUERIES.items():
+        started = time.perf_counter()
+        for query in queries:
+            resolve(query)
+        round_seconds = time.perf_counter() - started
+        rounds = max(1, min(iterations // len(queries), int(budget / round_seconds)))
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter_ns()
+            for _ in range(rounds):
+                for query in queries:
+                    resolve(query)
+            best = min(best, (time.perf_counter_ns() - started) / (rounds * len(queries)))
+        results[kind] = {
+            "ns_per_op": best,
+            "resolved": sum(resolve(query) is not None for query in queries),
+            "queries": len(queries),
+        }
+    return results
+
+
+async def run_benchmarks(args) -> dict:
+    records = synthetic_corpus(args.quotes, args.authors, args.seed)
+    api, url = await start_mock_api(records)
+    try:
+        main.STOIC_API_URL = url
+        started = time.perf_counter()
+        await main.fetch_quotes()
+        fetch_seconds = time.perf_counter() - started
+    finally:
+        await api.cleanup()
+
+    if args.real_limits:
+        main.outbound = main.SendScheduler(
+            main.CHANNEL_SEND_RATE, main.CHANNEL_SEND_BURST, main.GLOBAL_SEND_RATE, main.SEND_COALESCE_SECONDS,
+        )
+    else:
+        # Measure the bot, not Discord's rate limits: lift throttles and send budgets out of reach
+        main.USER_COMMAND_LIMITS = dict.fromkeys(main.USER_COMMAND_LIMITS, 1 << 30)
+        main.DEFAULT_USER_COMMAND_LIMIT = main.GUILD_COMMAND_LIMIT = 1 << 30
+        main.outbound = main.SendScheduler(1e9, 1e9, 1e9)
+
+    BenchContext.http = FakeHTTP(args.http_latency_ms / 1000)
+    gateway = FakeGateway(args.users, args.guilds, args.seed)
+    results = {}
+    for command in args.commands:
+        results[command] = await benchmark_command(gateway, command, args)
+        print_row(command, results[command])
+
+    resolver = benchmark_resolver(args.resolver_iterations) if args.resolver_iterations else {}
+    for kind, result in resolver.items():
+        print_resolver_row(kind, result)
+
+    for store in main.state_stores.values():
+        await store.close()
+    if main.http_session is not None:
+        await main.http_session.close()
+
+    return {
+        "settings": {
+            key: getattr(args, key)
+            for key in ("operations", "concurrency", "users", "guilds", "quotes", "authors", "http_latency_ms", "real_limits")
+        },
+        "fetch": {"quotes": main.quote_index.total, "seconds": fetch_seconds},
+        "commands": results,
+        "resolver": resolver,
+    }
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REPORTING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+HEADER = f"{'command':<10} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'alloc KiB/op':>13} {'kept B/op':>10} {'errors':>7}"
+
+
+def print_row(command: str, result: dict):
+    print(
+        f"{command:<10} {result['throughput']:>10,.0f} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} "
+        f"{result['max_ms']:>8.2f} {result['alloc_kib']:>13.1f} {result['retained_bytes']:>10.0f} {result['errors']:>7.0f}"
+    )
+
+
+def print_resolver_row(kind: str, result: dict):
+    print(f"{'resolve ' + kind:<16} {result['ns_per_op']:>10,.0f} ns/op "
+          f"({result['resolved']}/{result['queries']} queries resolved)")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Describe every command or resolver lookup that got slower than the baseline by more than `tolerance`."""
+    regressions = []
+    for command, result in results["commands"].items():
+        before = baseline.get("commands", {}).get(command)
+        if before is None:
+            continue
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{command}: throughput {result['throughput']:,.0f}/s vs {before['throughput']:,.0f}/s baseline"
+            )
+        if (result["p99_ms"] > before["p99_ms"] * (1 + tolerance)
+                and result["p99_ms"] - before["p99_ms"] >= MIN_P99_DELTA_MS):
+            regressions.append(f"{command}: p99 {result['p99_ms']:.3f}ms vs {before['p99_ms']:.3f}ms baseline")
+    for kind, result in results.get("resolver", {}).items():
+        before = baseline.get("resolver", {}).get(kind)
+        if before is None:
+            continue
+        if (result["ns_per_op"] > before["ns_per_op"] * (1 + tolerance)
+                and result["ns_per_op"] - before["ns_per_op"] >= MIN_RESOLVER_DELTA_NS):
+            regressions.append(
+                f"resolve {kind}: {result['ns_per_op']:,.0f}ns vs {before['ns_per_op']:,.0f}ns baseline"
+            )
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test for the Stoic Quote Bot command handlers.")
+    parser.add_argument("--commands", default=",".join(COMMAND_MESSAGES),
+                        help=f"comma-separated commands to run (default: all of {', '.join(COMMAND_MESSAGES)})")
+    parser.add_argument("--operations", type=int, default=5000, help="measured invocations per command")
+    parser.add_argument("--warmup", type=int, default=500, help="unmeasured invocations per command first")
+    parser.add_argument("--concurrency", type=int, default=50, help="invocations in flight at once")
+    parser.add_argument("--users", type=int, default=10_000, help="distinct simulated users")
+    parser.add_argument("--guilds", type=int, default=100, help="distinct simulated guilds")
+    parser.add_argument("--quotes", type=int, default=3000, help="quotes served by the mock API")
+    parser.add_argument("--authors", type=int, default=3, help="authors in the synthetic corpus")
+    parser.add_argument("--http-latency-ms", type=float, default=0.0, help="simulated Discord API response time")
+    parser.add_argument("--alloc-samples", type=int, default=200, help="invocations traced for allocation stats")
+    parser.add_argument("--resolver-iterations", type=int, default=50_000,
+                        help="persona lookups timed per kind of match (0 skips the resolver benchmark)")
+    parser.add_argument("--real-limits", action="store_true",
+                        help="keep the production throttles and send rate limits instead of lifting them")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the corpus and traffic")
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="compare with saved results and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative throughput drop or p99 increase for --compare")
+    args = parser.parse_args(argv)
+
+    args.commands = [name.strip() for name in args.commands.split(",") if name.strip()]
+    unknown = [name for name in args.commands if name not in COMMAND_MESSAGES]
+    if unknown:
+        parser.error(f"unknown command(s): {', '.join(unknown)}")
+    return args
+
+
+def main_cli(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    main.configure_logging()
+    logging.getLogger().setLevel("WARNING")
+
+    print(f"🏋️ {args.operations} ops/command, concurrency {args.concurrency}, "
+          f"{args.users} users in {args.guilds} guilds, {args.quotes} quotes")
+    print(HEADER)
+    try:
+        results = asyncio.run(run_benchmarks(args))
+    finally:
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+    print(f"📚 Fetched {results['fetch']['quotes']} quotes from the mock API in {results['fetch']['seconds'] * 1000:.0f}ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Performance regressions:")
+            for line in regressions:
+                print(f"   • {line}")
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} of {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
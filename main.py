@@ -5,21 +5,56 @@ A Discord bot that dispenses Stoic wisdom from Marcus Aurelius, Seneca, and Epic
 Users can select a philosopher "persona" and receive quotes in that philosopher's unique style.
 
 Features:
-- Fetches 100 quotes from stoic-quotes.com on startup and groups by author
+- Warm starts from an on-disk quote snapshot, refreshing from stoic-quotes.com in the background
 - Rich Presence with rotating activities that change every 5 minutes
-- Philosopher persona system with independent per-user selections
+- Philosopher persona system with independent per-user selections (SQLite or Redis backed)
+- Immutable quote index rebuilt per corpus load for constant-time reads
+- Optional sharding (AutoShardedBot or multi-process workers sharing a memory-mapped corpus)
 - Detailed philosopher biographies with historical context
 - Smart guild welcome system with random persona selection and full command reference
 - Beautiful embed messages with Roman-themed gold/bronze color scheme
-- 8 interactive commands organized by functionality
+- 8 interactive commands organized by functionality, as prefix and slash commands
 """
 
 import os
 import random
+import asyncio
+import codecs
+import csv
+import hashlib
+import heapq
+import json
+import logging
+import math
+import re
+import mmap
+import socket
+import sqlite3
+import signal
+import ssl
+import struct
+import subprocess
+import sys
+import threading
+import time
+import unicodedata
 import aiohttp
 import discord
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, fields, replace
+from datetime import datetime, time as dtime, timedelta
+from urllib.parse import unquote, urlparse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from discord.ext import commands, tasks
-from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIGURATION
@@ -27,6 +62,149 @@ from collections import defaultdict
 
 STOIC_API_URL = "https://stoic-quotes.com/api/quotes?num=100"
 
+# With MESSAGE_CONTENT_INTENT=0 the gateway stops delivering message text (and
+# guild message events) entirely, and the bot is driven by slash commands only
+MESSAGE_CONTENT_INTENT = os.environ.get("MESSAGE_CONTENT_INTENT", "1") != "0"
+SLASH_COMMANDS = os.environ.get("SLASH_COMMANDS", "1") != "0" or not MESSAGE_CONTENT_INTENT
+
+# Low-memory profile: only the intents commands need, no message or member caches, smaller
+# state caches and throttle table, and the search index built on first use
+LOW_MEMORY = os.environ.get("LOW_MEMORY", "0") == "1"
+
+# Prefix shown in help text and hints
+PREFIX = "!" if MESSAGE_CONTENT_INTENT else "/"
+
+# Slash commands that haven't responded after this many seconds are deferred
+SLASH_DEFER_AFTER = 2.0
+
+# Local quote snapshot - loaded before connecting so commands work immediately
+QUOTE_SNAPSHOT_PATH = os.environ.get("QUOTE_SNAPSHOT_PATH", "data/quotes.snapshot")
+
+# Quote sources, comma-separated: "api" and/or paths to local .jsonl or .csv files with
+# author/text fields. The API has no paging - each request returns a fresh random sample -
+# so QUOTE_API_PAGES is how many samples are requested per refresh (duplicates are dropped).
+QUOTE_SOURCES = [s.strip() for s in os.environ.get("QUOTE_SOURCES", "api").split(",") if s.strip()]
+QUOTE_API_PAGES = int(os.environ.get("QUOTE_API_PAGES", "3"))
+
+# Ingestion HTTP limits: pooled connections, per-request timeout and stream chunk size
+QUOTE_FETCH_CONCURRENCY = 4
+QUOTE_FETCH_TIMEOUT = 30
+QUOTE_STREAM_CHUNK = 16 * 1024
+
+# How often the background task refreshes the corpus from its sources
+QUOTE_REFRESH_HOURS = 12
+
+# Sharding: "single" (one connection), "auto" (AutoShardedBot in this process)
+# or "multiprocess" (SHARD_PROCESSES workers, each running a range of shards)
+SHARD_MODE = os.environ.get("SHARD_MODE", "single")
+SHARD_COUNT = int(os.environ["SHARD_COUNT"]) if os.environ.get("SHARD_COUNT") else None
+SHARD_PROCESSES = int(os.environ.get("SHARD_PROCESSES", "2"))
+
+# Set by the multiprocess supervisor for each worker it spawns
+SHARD_IDS = [int(i) for i in os.environ["SHARD_IDS"].split(",")] if os.environ.get("SHARD_IDS") else None
+SHARD_WORKER = int(os.environ.get("SHARD_WORKER", "0"))
+
+# Worker 0 refreshes the corpus; the other workers map its snapshot read-only
+SHARED_CORPUS_READER = SHARD_IDS is not None and SHARD_WORKER > 0
+SNAPSHOT_WATCH_SECONDS = 60
+
+# On a reload, how long the other workers wait for worker 0 to write the rebuilt snapshot
+SHARED_RELOAD_TIMEOUT = 120
+SHARED_RELOAD_POLL_SECONDS = 1.0
+
+DISCORD_GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+
+# Where gateway sessions are saved at shutdown so the next boot can RESUME them instead of
+# IDENTIFYing ("" disables). Each multiprocess worker saves to its own file.
+GATEWAY_SESSION_PATH = os.environ.get("GATEWAY_SESSION_PATH", "data/gateway_sessions.json")
+if GATEWAY_SESSION_PATH and SHARD_IDS is not None:
+    GATEWAY_SESSION_PATH = "{0}.{2}{1}".format(*os.path.splitext(GATEWAY_SESSION_PATH), SHARD_WORKER)
+# Discord drops a disconnected session after a few minutes; older saved sessions aren't tried
+GATEWAY_RESUME_MAX_AGE = 180
+
+# Outbound send limits: Discord allows ~5 messages per 5s per channel and ~50 requests/s globally
+CHANNEL_SEND_RATE = 1.0
+CHANNEL_SEND_BURST = 5
+GLOBAL_SEND_RATE = 45.0
+
+# Identical messages to one channel within this window are sent once (0 disables)
+SEND_COALESCE_SECONDS = float(os.environ.get("SEND_COALESCE_SECONDS", "0"))
+
+# On SIGTERM/SIGINT, how long queued messages get to go out before they are dropped
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "10"))
+
+# Command throttling: invocations allowed per sliding window, per user and per guild.
+# Guilds can override both through their GuildSettings.
+THROTTLE_WINDOW_SECONDS = 10.0
+THROTTLE_SLOTS = 1 << 14 if LOW_MEMORY else 1 << 18  # fixed table (~360 KB / ~5.8 MB); colliding keys evict each other
+USER_COMMAND_LIMITS = {
+    "quote": 5,
+    "random": 5,
+    "persona": 5,
+    "search": 3,
+    "authors": 3,
+    "bio": 3,
+    "help": 3,
+    "ping": 3,
+    "info": 3,
+    "daily": 3,
+    "limits": 3,
+    "reload": 1,
+}
+DEFAULT_USER_COMMAND_LIMIT = 3
+GUILD_COMMAND_LIMIT = 60
+
+# Deployment overrides for the limits above: a JSON object, inline or the path of a file holding
+# one, e.g. COMMAND_LIMITS='{"commands": {"quote": 10}, "default": 5, "guild": 120}'
+COMMAND_LIMITS = os.environ.get("COMMAND_LIMITS", "").strip()
+if COMMAND_LIMITS:
+    if not COMMAND_LIMITS.startswith("{"):
+        with open(COMMAND_LIMITS, encoding="utf-8") as f:
+            COMMAND_LIMITS = f.read()
+    _limits = json.loads(COMMAND_LIMITS)
+    USER_COMMAND_LIMITS.update({name: int(limit) for name, limit in _limits.get("commands", {}).items()})
+    DEFAULT_USER_COMMAND_LIMIT = int(_limits.get("default", DEFAULT_USER_COMMAND_LIMIT))
+    GUILD_COMMAND_LIMIT = int(_limits.get("guild", GUILD_COMMAND_LIMIT))
+    del _limits
+
+# Highest limit a server can set for itself with !limits (the throttle counters are 16-bit)
+MAX_COMMAND_LIMIT = 1000
+
+# Where user personas and guild settings are persisted (sqlite:///path or redis://host:port/db)
+STATE_STORE_URL = os.environ.get("STATE_STORE_URL", "sqlite:///data/state.db")
+
+# !search shows this many results; !quote <topic> picks among this many best matches
+SEARCH_RESULTS = 5
+SEARCH_TOPIC_POOL = 10
+
+# !quote walks each user's philosopher in a shuffled order without repeats (set to 0 for plain random)
+NO_REPEAT_QUOTES = os.environ.get("NO_REPEAT_QUOTES", "1") != "0"
+
+# Entries kept in memory per store, and how often pending writes are flushed
+PERSONA_CACHE_SIZE = 10_000 if LOW_MEMORY else 100_000
+GUILD_CACHE_SIZE = 5_000 if LOW_MEMORY else 50_000
+STATE_FLUSH_SECONDS = 10
+
+# Seconds a cached entry is trusted before it is re-read, so writes from other processes
+# show up. Defaults to 30 when the store is shared (multiprocess shards or Redis), else off.
+STATE_SHARED = SHARD_IDS is not None or not STATE_STORE_URL.startswith("sqlite:")
+STATE_CACHE_TTL = float(os.environ.get("STATE_CACHE_TTL", "30" if STATE_SHARED else "0"))
+
+# Daily quote broadcasts: how often due subscriptions are checked, how widely guilds' sends are
+# spread past their scheduled minute, and how late a firing missed while offline is still sent
+DAILY_TICK_SECONDS = 5
+DAILY_SPREAD_SECONDS = 60
+DAILY_CATCHUP_HOURS = 12
+DEFAULT_TIMEZONE = "UTC"
+
+# Prometheus-style metrics on http://METRICS_HOST:METRICS_PORT/metrics (0 disables them).
+# With multiprocess sharding, each worker listens on METRICS_PORT + its worker index.
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Minimum level of the JSON log lines written to stdout
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
 # Author greetings - simulating each philosopher's unique style
 AUTHOR_GREETINGS = {
     "Marcus Aurelius": [
@@ -46,133 +224,2836 @@ AUTHOR_GREETINGS = {
     ],
 }
 
-# Default persona when no author is selected (will be set on bot startup/guild join)
-DEFAULT_PERSONA = "Marcus Aurelius"
+# Global default persona when neither the user nor their guild has selected one
+DEFAULT_PERSONA = "Marcus Aurelius"
+
+# Bot activity statuses for Rich Presence (rotating)
+ACTIVITIES = [
+    discord.Activity(type=discord.ActivityType.watching, name="over your thoughts"),
+    discord.Activity(type=discord.ActivityType.listening, name="Seneca"),
+    discord.Activity(type=discord.ActivityType.playing, name="The Stoic Game"),
+    discord.Activity(type=discord.ActivityType.competing, name="Rome"),
+]
+
+# Footer configuration for embeds
+FOOTER_TEXT = "🚂 Powered by Stoic Wisdom • Railway Deployment"
+
+# Uniform embed color theme
+EMBED_COLOR = discord.Color.from_rgb(212, 175, 55)  # Gold/Bronze - Roman theme
+
+# Extra names users may type for !persona (full names, words and prefixes are matched automatically)
+AUTHOR_ALIASES = {
+    "Marcus Aurelius": ["Marcus Aurelius Antoninus", "Emperor"],
+    "Seneca": ["Lucius Annaeus Seneca", "Seneca the Younger"],
+    "Epictetus": ["Epiktetos"],
+}
+
+# Shortest prefix accepted by !persona (single letters are too ambiguous)
+PERSONA_MIN_PREFIX = 2
+
+# Philosopher biographies
+AUTHOR_BIOS = {
+    "Marcus Aurelius": {
+        "years": "121-180 AD",
+        "title": "Roman Emperor & Stoic Philosopher",
+        "description": "Roman Emperor and Stoic philosopher. His *Meditations* are private notes to himself on Stoic philosophy, written during military campaigns. He is considered the last of the Five Good Emperors.",
+        "emoji": "👑",
+    },
+    "Seneca": {
+        "years": "4 BC - 65 AD",
+        "title": "Stoic Philosopher & Statesman",
+        "description": "Roman Stoic philosopher, statesman, and dramatist. Advisor to Emperor Nero. Known for his letters on ethics and natural philosophy. His works on anger, tranquility, and the shortness of life remain influential.",
+        "emoji": "📝",
+    },
+    "Epictetus": {
+        "years": "50-135 AD",
+        "title": "Stoic Philosopher & Former Slave",
+        "description": "Born a slave, became one of the most influential Stoic philosophers. His teachings focus on what is *in our control* vs what is not. His philosophy emphasizes acceptance and inner freedom.",
+        "emoji": "⛓️",
+    },
+}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LOGGING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is logged as a field
+_LOG_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line, with `extra=` values as fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if SHARD_IDS is not None:
+            entry["worker"] = SHARD_WORKER
+        for key, value in record.__dict__.items():
+            if key not in _LOG_RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """Send this module's and py-cord's logs to stdout as JSON lines."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+
+log = logging.getLogger("stoicbot")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# QUOTE INDEX
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Sample lengths used by !authors and !bio
+AUTHORS_SAMPLE_LENGTH = 100
+BIO_SAMPLE_LENGTH = 200
+
+
+def truncate(text: str, limit: int) -> str:
+    """Shorten text to at most `limit` characters, ending with an ellipsis if cut."""
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def normalize_name(text: str) -> str:
+    """Casefold, strip accents and punctuation, and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    cleaned = "".join(c if c.isalnum() else " " for c in decomposed if not unicodedata.combining(c))
+    return " ".join(cleaned.split())
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance between a and b, or limit + 1 once it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class PersonaResolver:
+    """Maps what users type after !persona to an author.
+
+    Built once per corpus load. Every alias of every author (full name, each
+    word of it, extra AUTHOR_ALIASES) is normalized, and all of their
+    prefixes are flattened into one dict, so exact and prefix matches are a
+    single lookup. A prefix shared by several authors is ambiguous and is
+    not resolved. Misses fall back to edit distance, which also ranks the
+    suggestions shown when nothing matches.
+    """
+
+    __slots__ = ("_exact", "_prefixes", "_aliases")
+
+    def __init__(self, authors: Sequence[str], extra_aliases: dict[str, list[str]]):
+        aliases: dict[str, set[str]] = {}
+        for author in authors:
+            name = normalize_name(author)
+            for alias in (name, name.replace(" ", ""), *name.split(),
+                          *(normalize_name(a) for a in extra_aliases.get(author, ()))):
+                aliases.setdefault(alias, set()).add(author)
+
+        self._exact = {alias: next(iter(owners)) for alias, owners in aliases.items() if len(owners) == 1}
+        prefix_owners: dict[str, set[str]] = {}
+        for alias, owners in aliases.items():
+            for end in range(PERSONA_MIN_PREFIX, len(alias)):
+                prefix_owners.setdefault(alias[:end], set()).update(owners)
+        self._prefixes = {prefix: next(iter(owners)) for prefix, owners in prefix_owners.items() if len(owners) == 1}
+        self._aliases = tuple((alias, tuple(owners)) for alias, owners in aliases.items())
+
+    def resolve(self, query: str) -> str | None:
+        """Return the author `query` refers to, or None if it is unknown or ambiguous."""
+        key = query.casefold().strip()
+        author = self._exact.get(key) or self._prefixes.get(key)
+        if author is not None:
+            return author
+
+        key = normalize_name(query)
+        author = self._exact.get(key) or self._prefixes.get(key)
+        if author is not None:
+            return author
+
+        # Typo fallback: accept the closest alias if it is unambiguously closest
+        if len(key) < PERSONA_MIN_PREFIX:
+            return None
+        ranked = self._rank(key, prefixes=False)
+        if ranked and ranked[0][0] <= max(1, len(key) // 4):
+            if len(ranked) == 1 or ranked[1][0] > ranked[0][0]:
+                return ranked[0][1]
+        return None
+
+    def suggest(self, query: str, limit: int = 3) -> list[str]:
+        """Closest authors to `query`, best first."""
+        return [author for _, author in self._rank(normalize_name(query), prefixes=True)[:limit]]
+
+    def _rank(self, key: str, prefixes: bool) -> list[tuple[int, str]]:
+        """Authors ordered by their closest alias's edit distance to `key`.
+
+        With `prefixes`, also compare against each alias's leading characters
+        (at a one-edit penalty) so short queries can suggest long names.
+        """
+        if not key:
+            return []
+        limit = max(2, len(key) // 2)
+        best: dict[str, int] = {}
+        for alias, owners in self._aliases:
+            distance = edit_distance(key, alias, limit)
+            if prefixes:
+                distance = min(distance, edit_distance(key, alias[:len(key)], limit) + 1)
+            for author in owners:
+                if distance <= limit and distance < best.get(author, limit + 1):
+                    best[author] = distance
+        return sorted(((distance, author) for author, distance in best.items()))
+
+
+# Full-text search: BM25 parameters and the per-index cache of recent query results
+BM25_K1 = 1.2
+BM25_B = 0.75
+SEARCH_CACHE_SIZE = 256
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be but by do for from has have he her his i if in is it its me my no not of "
+    "on or our so than that the their them then there they this to us was we what when which who "
+    "will with you your".split()
+)
+_STEM_SUFFIXES = ("fulness", "ations", "ation", "ments", "ment", "ness", "ings", "ing", "edly", "ies", "ed", "es", "ly", "s")
+
+
+def stem(word: str) -> str:
+    """Light suffix-stripping stemmer ("angered", "angers" -> "anger"; "lives", "living" -> "liv")."""
+    for suffix in _STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "s" and word[-2] in "siu":
+                break
+            word = word[:-len(suffix)] + ("i" if suffix == "ies" else "")
+            break
+    if len(word) > 3:
+        if word[-1] == "e":
+            word = word[:-1]
+        elif word[-1] == "y":
+            word = word[:-1] + "i"
+        elif word[-1] == word[-2] and word[-1] not in "lsz":
+            word = word[:-1]
+    return word
+
+
+def search_terms(text: str) -> list[str]:
+    """Tokenize, drop stop words and stem; used for both quotes and queries."""
+    text = text.casefold().replace("'", "").replace("’", "")
+    return [stem(token) for token in _TOKEN_RE.findall(text) if token not in _STOP_WORDS]
+
+
+class SearchIndex:
+    """Inverted index over the quote corpus with BM25 ranking.
+
+    Each term's postings are a slice of two flat arrays: quote positions in
+    ascending order and their precomputed BM25 weights, so a query is a few
+    dict lookups plus summing array slices. Sorted postings also let a query
+    be limited to one author's [start, end) range with a bisect.
+    With `lazy`, the postings are only built when first needed; await
+    `ready()` before searching so that build runs in a worker thread.
+    """
+
+    __slots__ = ("quotes", "terms", "doc_ids", "weights", "total", "_cache", "_building")
+
+    def __init__(self, quotes: Sequence[str], lazy: bool = False):
+        self.quotes = quotes
+        self.terms: dict[str, tuple[int, int]] | None = None
+        self.total = len(quotes)
+        self._cache: OrderedDict[tuple, tuple[int, ...]] = OrderedDict()
+        self._building: asyncio.Future | None = None
+        if not lazy:
+            self._build()
+
+    async def ready(self):
+        """Build the postings off the event loop if a lazy index hasn't built them yet."""
+        if self.terms is None:
+            if self._building is None:
+                self._building = asyncio.ensure_future(asyncio.to_thread(self._build))
+            await asyncio.shield(self._building)
+
+    def _build(self):
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        for doc_id, quote in enumerate(self.quotes):
+            tokens = search_terms(quote)
+            lengths.append(len(tokens))
+            counts: dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        total = len(lengths)
+        average = sum(lengths) / total if total else 1.0
+        terms: dict[str, tuple[int, int]] = {}
+        doc_ids = array("I")
+        weights = array("f")
+        for token, entries in postings.items():
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            terms[sys.intern(token)] = (len(doc_ids), len(doc_ids) + len(entries))
+            for doc_id, tf in entries:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / (average or 1.0))
+                doc_ids.append(doc_id)
+                weights.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+        # Publish `terms` last: searches treat it as the "built" flag
+        self.doc_ids, self.weights = doc_ids, weights
+        self.terms = terms
+
+    def search(self, query: str, limit: int, start: int = 0, end: int | None = None) -> tuple[int, ...]:
+        """Positions of the best `limit` quotes for `query`, best first, within [start, end)."""
+        if self.terms is None:
+            self._build()
+        end = self.total if end is None else end
+        terms = tuple(sorted(set(search_terms(query))))
+        key = (terms, limit, start, end)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        scores: dict[int, float] = {}
+        for term in terms:
+            span = self.terms.get(term)
+            if span is None:
+                continue
+            low, high = span
+            if start > 0 or end < self.total:
+                low = bisect_left(self.doc_ids, start, low, high)
+                high = bisect_left(self.doc_ids, end, low, high)
+            for doc_id, weight in zip(self.doc_ids[low:high], self.weights[low:high]):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+
+        results = tuple(heapq.nlargest(limit, scores, key=scores.__getitem__))
+        self._cache[key] = results
+        if len(self._cache) > SEARCH_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return results
+
+
+@dataclass(frozen=True, slots=True)
+class QuoteIndex:
+    """Immutable, read-optimized view of the quote corpus.
+
+    Built once per corpus load and swapped in atomically. Quotes are stored
+    contiguously per author so every read command does constant work.
+    """
+
+    version: int
+    authors: tuple[str, ...]  # interned names, in corpus order
+    author_ids: dict[str, int]  # author name -> position in `authors`
+    sorted_ids: tuple[int, ...]  # author ids in alphabetical order (for !authors)
+    quotes: Sequence[str]  # all quotes, grouped by author
+    quote_authors: array  # author id of each quote
+    ranges: tuple[tuple[int, int], ...]  # per-author [start, end) into `quotes`
+    samples: tuple[str, ...]  # per-author truncated first quote
+    resolver: PersonaResolver  # !persona name matching for these authors
+    search: SearchIndex  # !search full-text index over `quotes`
+    total: int
+
+    @classmethod
+    def build(cls, corpus: dict[str, list[str]], version: int) -> "QuoteIndex":
+        """Build an index from an author -> quotes mapping."""
+        names, quotes, ranges = [], [], []
+        for author, author_quotes in corpus.items():
+            names.append(author)
+            ranges.append((len(quotes), len(quotes) + len(author_quotes)))
+            quotes.extend(author_quotes)
+        return cls.from_ranges(version, names, ranges, tuple(quotes))
+
+    @classmethod
+    def from_ranges(cls, version: int, names: list[str], ranges: list[tuple[int, int]],
+                    quotes: Sequence[str]) -> "QuoteIndex":
+        """Build an index over an existing quote sequence split into per-author ranges."""
+        authors, author_ranges, samples = [], [], []
+        quote_authors = array("H", bytes(2 * len(quotes)))
+
+        for name, (start, end) in zip(names, ranges):
+            if start == end:
+                continue
+            author_id = len(authors)
+            authors.append(sys.intern(name))
+            author_ranges.append((start, end))
+            first = quotes[start]
+            samples.append(first[:AUTHORS_SAMPLE_LENGTH] + "..." if len(first) > AUTHORS_SAMPLE_LENGTH else first)
+            quote_authors[start:end] = array("H", [author_id]) * (end - start)
+
+        return cls(
+            version=version,
+            authors=tuple(authors),
+            author_ids={author: i for i, author in enumerate(authors)},
+            sorted_ids=tuple(sorted(range(len(authors)), key=authors.__getitem__)),
+            quotes=quotes,
+            quote_authors=quote_authors,
+            ranges=tuple(author_ranges),
+            samples=tuple(samples),
+            resolver=PersonaResolver(authors, AUTHOR_ALIASES),
+            search=SearchIndex(quotes, lazy=LOW_MEMORY),
+            total=len(quotes),
+        )
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def count(self, author: str) -> int:
+        """Number of quotes for an author (0 if unknown)."""
+        author_id = self.author_ids.get(author)
+        if author_id is None:
+            return 0
+        start, end = self.ranges[author_id]
+        return end - start
+
+    def random_quote(self) -> tuple[str, str]:
+        """Pick a quote uniformly over the whole corpus. Returns (author, quote)."""
+        i = random.randrange(self.total)
+        return self.authors[self.quote_authors[i]], self.quotes[i]
+
+    def random_quote_by(self, author: str) -> str | None:
+        """Pick a random quote from one author, or None if the author has no quotes."""
+        author_id = self.author_ids.get(author)
+        if author_id is None:
+            return None
+        return self.quotes[random.randrange(*self.ranges[author_id])]
+
+    def author_range(self, author: str) -> tuple[int, int] | None:
+        """[start, end) of an author's quotes in `quotes`, or None if unknown."""
+        author_id = self.author_ids.get(author)
+        return None if author_id is None else self.ranges[author_id]
+
+    def search_quotes(self, query: str, limit: int, author: str | None = None) -> tuple[int, ...]:
+        """Best-matching quote positions for `query`, optionally limited to one author."""
+        if author is None:
+            return self.search.search(query, limit)
+        author_range = self.author_range(author)
+        return self.search.search(query, limit, *author_range) if author_range else ()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# QUOTE CURSORS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# A cursor packs (seed, cycle length, offset, author tag) into one int:
+# 32 + 32 + 32 + 16 bits, i.e. 14 bytes per user. Lengths and offsets are as
+# wide as the seed, so a cycle can cover any author's full quote count.
+_CURSOR_SEED_BITS = 32
+_CURSOR_FIELD_BITS = 32
+_CURSOR_FIELD_MASK = (1 << _CURSOR_FIELD_BITS) - 1
+_CURSOR_TAG_BITS = 16
+_CURSOR_TAG_MASK = (1 << _CURSOR_TAG_BITS) - 1
+_FEISTEL_ROUNDS = 4
+
+
+def _feistel_round(value: int, seed: int, round_number: int) -> int:
+    """Stable 32-bit integer mix used as the Feistel round function."""
+    h = (value * 0x9E3779B1 + seed + round_number * 0x7F4A7C15) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 0x2C1B3C6D) & 0xFFFFFFFF
+    return h ^ (h >> 12)
+
+
+def permute(index: int, n: int, seed: int) -> int:
+    """Map `index` in [0, n) to its position in a seeded pseudo-random permutation of [0, n).
+
+    A small Feistel network is a bijection on the enclosing power-of-four
+    domain; cycle-walking (re-applying it until the result is below n) turns
+    that into a bijection on [0, n). O(1) expected, nothing materialized.
+    """
+    if n <= 1:
+        return 0
+    half = ((n - 1).bit_length() + 1) // 2
+    mask = (1 << half) - 1
+    x = index
+    while True:
+        left, right = x >> half, x & mask
+        for round_number in range(_FEISTEL_ROUNDS):
+            left, right = right, left ^ (_feistel_round(right, seed, round_number) & mask)
+        x = (left << half) | right
+        if x < n:
+            return x
+
+
+def cycle_tag(author: str, last_quote: str) -> int:
+    """Short hash of a cycle's author and the last quote it covers."""
+    return quote_hash(f"{author}\0{last_quote}") & _CURSOR_TAG_MASK
+
+
+def pack_cursor(seed: int, length: int, offset: int, tag: int) -> int:
+    bits = _CURSOR_FIELD_BITS
+    return (((seed << bits | length) << bits | offset) << _CURSOR_TAG_BITS) | tag
+
+
+def unpack_cursor(cursor: int) -> tuple[int, int, int, int]:
+    """Inverse of pack_cursor: (seed, cycle length, offset, author tag)."""
+    bits, mask, tag_bits = _CURSOR_FIELD_BITS, _CURSOR_FIELD_MASK, _CURSOR_TAG_BITS
+    return (cursor >> (2 * bits + tag_bits), (cursor >> (bits + tag_bits)) & mask,
+            (cursor >> tag_bits) & mask, cursor & _CURSOR_TAG_MASK)
+
+
+def advance_cursor(cursor: int | None, author: str, count: int,
+                   quote_at: Callable[[int], str]) -> tuple[int, int]:
+    """Pick the next unseen quote position for an author with `count` quotes.
+
+    A cycle walks a fixed permutation of the author's first `length` quotes.
+    Refreshes only append quotes, so an in-progress cycle stays valid across
+    versions and new quotes join the next cycle. A reload can reorder or drop
+    quotes, though: the cursor's tag covers the last quote of its cycle
+    (`quote_at(length - 1)`), and a cycle whose prefix moved starts over.
+    A new cycle never opens with the quote that closed the previous one.
+    Returns (position within the author's range, updated cursor).
+    """
+    previous = None
+    if cursor is not None:
+        seed, length, offset, tag = unpack_cursor(cursor)
+        if not 0 < length <= count or offset > length or tag != cycle_tag(author, quote_at(length - 1)):
+            cursor = None
+        elif offset == length:
+            previous, cursor = permute(length - 1, length, seed), None
+    if cursor is None:
+        length, offset = min(count, _CURSOR_FIELD_MASK), 0
+        seed = random.getrandbits(_CURSOR_SEED_BITS)
+        while length > 1 and permute(0, length, seed) == previous:
+            seed = random.getrandbits(_CURSOR_SEED_BITS)
+        tag = cycle_tag(author, quote_at(length - 1))
+    return permute(offset, length, seed), pack_cursor(seed, length, offset + 1, tag)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# STATE STORE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SQLiteBackend:
+    """Key-value backend stored in a table of a local SQLite database (WAL mode)."""
+
+    def __init__(self, path: str, table: str):
+        self.path = path
+        self.table = table
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: int) -> str | None:
+        with self._lock:
+            row = self._connect().execute(f"SELECT value FROM {self.table} WHERE id = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def items(self) -> list[tuple[int, str]]:
+        with self._lock:
+            return self._connect().execute(f"SELECT id, value FROM {self.table}").fetchall()
+
+    def save_many(self, items: dict[int, str]):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO {self.table} (id, value) VALUES (?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET value = excluded.value",
+                    items.items(),
+                )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RedisBackend:
+    """Key-value backend stored in a Redis hash, spoken over plain RESP.
+
+    Works with any server implementing HGET/HSET, so several processes or
+    shards can share the same state. Connections authenticate with AUTH when
+    a password is given, and use TLS with `tls`.
+    """
+
+    def __init__(self, key: str, host: str = "localhost", port: int = 6379, db: int = 0,
+                 timeout: float = 2.0, username: str | None = None, password: str | None = None,
+                 tls: bool = False):
+        self.host, self.port, self.db, self.key, self.timeout = host, port, db, key, timeout
+        self.username, self.password, self.tls = username, password, tls
+        self._sock: socket.socket | None = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._sock is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            if self.tls:
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+            self._sock, self._reader = sock, sock.makefile("rb")
+            handshake = []
+            if self.password:
+                # AUTH <password> logs in as "default" and also works before Redis 6 (no ACL users)
+                handshake.append(("AUTH", self.username, self.password)
+                                 if self.username and self.username != "default" else ("AUTH", self.password))
+            if self.db:
+                handshake.append(("SELECT", self.db))
+            try:
+                if handshake:
+                    self._send(handshake)
+            except BaseException:
+                self.close_unlocked()
+                raise
+        return self._sock
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RuntimeError(f"Redis error: {rest.decode('utf-8')}")
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return self._reader.read(length + 2)[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def _send(self, commands: list[tuple]) -> list:
+        """Pipeline several commands in one round trip and return their replies."""
+        self._sock.sendall(b"".join(self._encode(*command) for command in commands))
+        return [self._read_reply() for _ in commands]
+
+    def _execute(self, commands: list[tuple]) -> list:
+        with self._lock:
+            try:
+                self._connect()
+                return self._send(commands)
+            except (OSError, ConnectionError):
+                # Drop the broken connection and retry once on a fresh one
+                self.close_unlocked()
+                self._connect()
+                return self._send(commands)
+
+    def get(self, key: int) -> str | None:
+        return self._execute([("HGET", self.key, key)])[0]
+
+    def items(self) -> list[tuple[int, str]]:
+        flat = self._execute([("HGETALL", self.key)])[0] or []
+        return [(int(key), value) for key, value in zip(flat[::2], flat[1::2])]
+
+    def save_many(self, items: dict[int, str]):
+        args = [part for key, value in items.items() for part in (key, value)]
+        self._execute([("HSET", self.key, *args)])
+
+    def close_unlocked(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = self._reader = None
+
+    def close(self):
+        with self._lock:
+            self.close_unlocked()
+
+
+def open_store_backend(url: str, table: str):
+    """Create a state backend from a URL (sqlite:///path, or redis[s]://[user:password@]host:port/db)."""
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(parsed.path.removeprefix("/") or "state.db", table)
+    if parsed.scheme in ("redis", "rediss"):
+        db = int(parsed.path.strip("/") or 0)
+        return RedisBackend(
+            f"stoic:{table}", parsed.hostname or "localhost", parsed.port or 6379, db,
+            username=unquote(parsed.username) if parsed.username else None,
+            password=unquote(parsed.password) if parsed.password else None,
+            tls=parsed.scheme == "rediss",
+        )
+    raise ValueError(f"Unsupported state store URL scheme: {parsed.scheme!r} (use sqlite:// or redis://)")
+
+
+# Errors a state backend raises when its storage is unreachable or refuses a command
+STATE_BACKEND_ERRORS = (OSError, RuntimeError, sqlite3.Error)
+
+
+# Cached "nothing stored" marker, so repeat misses don't hit the backend
+_MISSING = object()
+
+
+class WriteBehindStore:
+    """Persistent id -> value map: an in-process LRU in front of a write-behind backend.
+
+    Cache hits are a dict lookup. Writes land in the cache immediately and are
+    flushed to the backend in batches, so commands never wait on storage. If
+    the backend can't be read, `get` returns the default without caching it.
+    Values are converted to and from the backend's strings with `encode`/`decode`.
+
+    When other processes write to the same backend, set `ttl` so cached entries
+    (including cached misses) are re-read after that many seconds.
+    """
+
+    def __init__(self, backend, capacity: int = 100_000, encode=str, decode=str, ttl: float = 0.0):
+        self.backend = backend
+        self.capacity = capacity
+        self.encode = encode
+        self.decode = decode
+        self.ttl = ttl
+        self._cache: OrderedDict[int, object] = OrderedDict()
+        self._expires: dict[int, float] = {}  # only used with a ttl
+        self._dirty: dict[int, object] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: int, value: object):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if self.ttl:
+            self._expires[key] = time.monotonic() + self.ttl
+        # Evicting an unflushed write is safe: misses check _dirty before the backend
+        while len(self._cache) > self.capacity:
+            evicted, _ = self._cache.popitem(last=False)
+            self._expires.pop(evicted, None)
+
+    def _cached(self, key: int):
+        """The cached value for `key` (possibly _MISSING), or None if absent or expired."""
+        value = self._cache.get(key)
+        if value is not None and self.ttl and self._expires[key] <= time.monotonic():
+            del self._cache[key], self._expires[key]
+            return None
+        return value
+
+    async def get(self, key: int, default=None):
+        """Return the value for `key`, loading it from the backend on a cache miss."""
+        value = self._cached(key)
+        if value is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return default if value is _MISSING else value
+
+        self.misses += 1
+        value = self._dirty.get(key)
+        if value is None:
+            try:
+                raw = await asyncio.to_thread(self.backend.get, key)
+            except STATE_BACKEND_ERRORS as e:
+                log.warning("State backend read failed", extra={"key": key, "error": str(e)})
+                return default
+            # A set() (or another load) that landed during the read is newer than what we read
+            current = self._cached(key)
+            if current is not None:
+                return default if current is _MISSING else current
+            value = self._dirty.get(key)
+            if value is None and raw is not None:
+                value = self.decode(raw)
+        self._remember(key, _MISSING if value is None else value)
+        return default if value is None else value
+
+    def set(self, key: int, value):
+        """Record a value; it is persisted on the next flush."""
+        self._remember(key, value)
+        self._dirty[key] = value
+
+    async def items(self) -> list[tuple[int, object]]:
+        """Every stored entry, including unflushed writes. Reads the whole backend table."""
+        rows = await asyncio.to_thread(self.backend.items)
+        merged = {key: self.decode(raw) for key, raw in rows}
+        merged.update(self._dirty)
+        return list(merged.items())
+
+    async def flush(self):
+        """Write all pending values to the backend in one batch."""
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        try:
+            encoded = {key: self.encode(value) for key, value in batch.items()}
+            await asyncio.to_thread(self.backend.save_many, encoded)
+        except Exception:
+            # Keep the batch (without clobbering newer writes) so the next flush retries it
+            self._dirty = {**batch, **self._dirty}
+            raise
+
+    async def close(self):
+        """Flush pending writes and release the backend."""
+        await self.flush()
+        await asyncio.to_thread(self.backend.close)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# GUILD SETTINGS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True, slots=True)
+class GuildSettings:
+    """Per-guild configuration. Immutable - use `dataclasses.replace` to change it."""
+
+    default_persona: str | None = None
+    command_limits: dict[str, int] | None = None  # per-user limits by command, overriding USER_COMMAND_LIMITS
+    guild_command_limit: int | None = None  # per-command limit for the whole guild
+
+    def to_json(self) -> str:
+        """Encode as compact JSON, omitting unset fields."""
+        return json.dumps({k: v for k, v in asdict(self).items() if v is not None}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "GuildSettings":
+        """Decode settings, ignoring keys this version doesn't know about."""
+        data = json.loads(raw)
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+
+NO_GUILD_SETTINGS = GuildSettings()
+
+
+@dataclass(frozen=True, slots=True)
+class DailySubscription:
+    """A guild's quote-of-the-day subscription. Immutable - use `dataclasses.replace` to change it."""
+
+    channel_id: int | None  # None once unsubscribed
+    time: str  # local "HH:MM"
+    timezone: str = DEFAULT_TIMEZONE  # IANA name, e.g. "Europe/Rome"
+    last_fired: float = 0.0  # Unix time of the last firing (or of subscribing)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "DailySubscription":
+        """Decode a subscription, ignoring keys this version doesn't know about."""
+        data = json.loads(raw)
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# OUTBOUND SCHEDULER
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Send priorities (lower is sent first)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` burst, refilled at `rate` tokens per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> float:
+        """Add the tokens accrued since the last update and return the current level."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def take(self) -> float:
+        """Take a token if one is available. Returns 0, or the seconds until one will be."""
+        if self.refill() >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass(slots=True)
+class SendJob:
+    """One queued outbound message."""
+
+    send: object  # coroutine function, e.g. ctx.send or channel.send
+    kwargs: dict
+    future: asyncio.Future
+    enqueued: float
+    key: int | None = None
+
+
+class SendScheduler:
+    """Outbound message scheduler with per-channel token buckets and priorities.
+
+    Each channel with pending messages gets a short-lived drain task that sends
+    its queue in priority order while staying under the per-channel rate. All
+    channels share one global bucket, and background sends yield to
+    interactive replies when global tokens run out. Optionally, identical
+    messages to one channel within `coalesce_seconds` collapse into one send.
+    """
+
+    def __init__(self, channel_rate: float, channel_burst: int, global_rate: float,
+                 coalesce_seconds: float = 0.0):
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.coalesce_seconds = coalesce_seconds
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self._queues: dict[int, list[tuple[int, int, SendJob]]] = {}
+        self._buckets: dict[int, TokenBucket] = {}
+        self._pending_keys: dict[tuple[int, int], SendJob] = {}
+        self._recent: dict[tuple[int, int], tuple[float, object]] = {}
+        self._last_prune = 0.0
+        self._tasks: set[asyncio.Task] = set()
+        self._sequence = 0
+        self._interactive_waiting = 0
+
+        # Metrics
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def send(self, channel_id: int, send, priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Queue a message for `channel_id` and wait until it has been sent."""
+        loop = asyncio.get_running_loop()
+        key = self._coalesce_key(kwargs) if self.coalesce_seconds else None
+        if key is not None:
+            pending = self._pending_keys.get((channel_id, key))
+            if pending is not None:
+                self.coalesced += 1
+                return await asyncio.shield(pending.future)
+            recent = self._recent.get((channel_id, key))
+            if recent is not None and loop.time() - recent[0] < self.coalesce_seconds:
+                self.coalesced += 1
+                return recent[1]
+
+        job = SendJob(send, kwargs, loop.create_future(), time.monotonic(), key)
+        if key is not None:
+            self._pending_keys[(channel_id, key)] = job
+
+        self._sequence += 1
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = []
+            task = asyncio.create_task(self._drain(channel_id, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        heapq.heappush(queue, (priority, self._sequence, job))
+
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        return await job.future
+
+    @staticmethod
+    def _coalesce_key(kwargs: dict) -> int:
+        """Hash a message's content so identical messages get the same key."""
+        embed = kwargs.get("embed")
+        payload = embed.to_dict() if embed is not None else None
+        return hash((kwargs.get("content"), json.dumps(payload, sort_keys=True, default=str)))
+
+    async def _acquire_global(self, priority: int):
+        """Wait for a global token; background sends defer to waiting interactive ones."""
+        while True:
+            if priority > PRIORITY_INTERACTIVE and self._interactive_waiting:
+                await asyncio.sleep(1 / self.global_bucket.rate)
+                continue
+            delay = self.global_bucket.take()
+            if not delay:
+                return
+            if priority == PRIORITY_INTERACTIVE:
+                self._interactive_waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                if priority == PRIORITY_INTERACTIVE:
+                    self._interactive_waiting -= 1
+
+    async def _drain(self, channel_id: int, queue: list):
+        """Send one channel's queued messages in priority order, respecting its bucket."""
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst)
+        try:
+            while queue:
+                delay = bucket.take()
+                if delay:
+                    await asyncio.sleep(delay)
+                    continue
+
+                priority, _, job = heapq.heappop(queue)
+                try:
+                    await self._acquire_global(priority)
+                except asyncio.CancelledError:
+                    heapq.heappush(queue, (priority, 0, job))
+                    raise
+
+                waited = time.monotonic() - job.enqueued
+                self.queue_depth -= 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+                try:
+                    result = await job.send(**job.kwargs)
+                except asyncio.CancelledError:
+                    # Cancelled mid-send: the awaiting handler must not wait forever
+                    job.future.cancel()
+                    self.dropped += 1
+                    raise
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                else:
+                    self.sent += 1
+                    if not job.future.done():
+                        job.future.set_result(result)
+                    if job.key is not None:
+                        self._recent[(channel_id, job.key)] = (asyncio.get_running_loop().time(), result)
+                finally:
+                    if job.key is not None:
+                        self._pending_keys.pop((channel_id, job.key), None)
+        finally:
+            # Only reached with jobs left if the drain task was cancelled
+            for _, _, job in queue:
+                job.future.cancel()
+                self.queue_depth -= 1
+                self.dropped += 1
+            del self._queues[channel_id]
+            self._prune()
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to `timeout` seconds for queued messages to be sent, then cancel the rest.
+
+        Returns how many messages were dropped.
+        """
+        if not self._tasks:
+            return 0
+        dropped = self.dropped
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return self.dropped - dropped
+
+    def _prune(self):
+        """Forget idle state so memory stays proportional to recently active channels."""
+        now = asyncio.get_running_loop().time()
+        if now - self._last_prune < max(self.coalesce_seconds, 30.0):
+            return
+        self._last_prune = now
+
+        # A full bucket carries no information - a fresh one behaves the same
+        self._buckets = {
+            channel_id: bucket for channel_id, bucket in self._buckets.items()
+            if channel_id in self._queues or bucket.refill() < self.channel_burst
+        }
+        cutoff = now - self.coalesce_seconds
+        self._recent = {key: entry for key, entry in self._recent.items() if entry[0] >= cutoff}
+
+    def stats(self) -> dict:
+        """Current queue metrics."""
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "active_channels": len(self._queues),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "avg_wait_ms": 1000 * self.wait_total / self.sent if self.sent else 0.0,
+            "max_wait_ms": 1000 * self.wait_max,
+        }
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# THROTTLING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SlidingWindowLimiter:
+    """Approximate sliding-window counters in a fixed-size hash table.
+
+    Each slot holds one key with its counts for the current and previous
+    window; the sliding count is the previous count weighted by how much of
+    it still overlaps, plus the current count. Memory is fixed at ~20 bytes
+    per slot no matter how many users there are - a key whose slot is taken
+    by another key simply evicts it and starts fresh.
+    """
+
+    def __init__(self, window: float, slots: int):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.window = window
+        self._mask = slots - 1
+        self._keys = array("q", bytes(8 * slots))
+        self._epochs = array("q", bytes(8 * slots))
+        self._current = array("H", bytes(2 * slots))
+        self._previous = array("H", bytes(2 * slots))
+        self._rejected = array("H", bytes(2 * slots))
+
+    def hit(self, key: int, limit: int, now: float) -> int:
+        """Count one event for `key`.
+
+        Returns 0 if it is within `limit`, otherwise how many times the key
+        has been rejected in the current window (1 for the first rejection).
+        """
+        slot = key & self._mask
+        position = now / self.window
+        epoch = int(position)
+
+        if self._keys[slot] != key:
+            self._keys[slot] = key
+            self._epochs[slot] = epoch
+            self._current[slot] = self._previous[slot] = self._rejected[slot] = 0
+        elif self._epochs[slot] != epoch:
+            self._previous[slot] = self._current[slot] if self._epochs[slot] == epoch - 1 else 0
+            self._current[slot] = self._rejected[slot] = 0
+            self._epochs[slot] = epoch
+
+        if self._previous[slot] * (1 - (position - epoch)) + self._current[slot] >= limit:
+            rejected = min(self._rejected[slot] + 1, 0xFFFF)
+            self._rejected[slot] = rejected
+            return rejected
+
+        self._current[slot] = min(self._current[slot] + 1, 0xFFFF)
+        return 0
+
+
+class CommandThrottled(commands.CheckFailure):
+    """Raised when a command invocation exceeds its rate limit."""
+
+    def __init__(self, command: str, retry_after: float, first: bool):
+        super().__init__(f"{command} is throttled for {retry_after:.1f}s")
+        self.command = command
+        self.retry_after = retry_after
+        self.first = first
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DAILY QUOTE SCHEDULE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def parse_daily_time(text: str) -> tuple[int, int] | None:
+    """Parse "HH:MM" (24-hour) into (hour, minute), or None if invalid."""
+    hour, sep, minute = text.strip().partition(":")
+    if not (sep and hour.isdigit() and minute.isdigit() and len(minute) == 2):
+        return None
+    hour, minute = int(hour), int(minute)
+    return (hour, minute) if hour < 24 and minute < 60 else None
+
+
+def load_timezone(name: str) -> ZoneInfo | None:
+    """Look up an IANA timezone (e.g. "Europe/Rome"), or None if unknown."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def daily_fires(guild_id: int, subscription: DailySubscription, around: float, step: int):
+    """Yield a subscription's firings day by day, starting on the local date of `around`.
+
+    Each guild fires at a fixed offset into its minute, derived from its id,
+    so guilds sharing a time don't all send in the same second.
+    """
+    tz = ZoneInfo(subscription.timezone)
+    hour, minute = parse_daily_time(subscription.time)
+    spread = guild_id % DAILY_SPREAD_SECONDS
+    day = datetime.fromtimestamp(around, tz).date()
+    while True:
+        yield datetime.combine(day, dtime(hour, minute), tzinfo=tz).timestamp() + spread
+        day += timedelta(days=step)
+
+
+def next_daily_fire(guild_id: int, subscription: DailySubscription, after: float) -> float:
+    """First firing of a subscription strictly after `after` (a Unix timestamp)."""
+    return next(fire for fire in daily_fires(guild_id, subscription, after, 1) if fire > after)
+
+
+def last_daily_fire(guild_id: int, subscription: DailySubscription, before: float) -> float:
+    """Latest firing of a subscription at or before `before` (a Unix timestamp)."""
+    return next(fire for fire in daily_fires(guild_id, subscription, before, -1) if fire <= before)
+
+
+class DailySchedule:
+    """Min-heap of subscriptions keyed by next fire time.
+
+    Each tick only looks at the top of the heap, so the cost of checking is
+    independent of the number of subscribed guilds. Rescheduling or removing
+    a guild leaves its old heap entry behind; stale entries are recognized
+    by their fire time and skipped when popped.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._next: dict[int, tuple[float, DailySubscription]] = {}
+
+    def __len__(self) -> int:
+        return len(self._next)
+
+    def add(self, guild_id: int, subscription: DailySubscription, after: float):
+        """(Re)schedule a guild's next firing after `after`."""
+        self.add_at(guild_id, subscription, next_daily_fire(guild_id, subscription, after))
+
+    def add_at(self, guild_id: int, subscription: DailySubscription, fire_at: float):
+        """(Re)schedule a guild to fire at `fire_at`."""
+        self._next[guild_id] = (fire_at, subscription)
+        heapq.heappush(self._heap, (fire_at, guild_id))
+
+    def remove(self, guild_id: int):
+        self._next.pop(guild_id, None)
+
+    def pop_due(self, now: float) -> list[tuple[int, DailySubscription, float]]:
+        """Remove and return every (guild id, subscription, fire time) due by `now`."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, guild_id = heapq.heappop(self._heap)
+            entry = self._next.get(guild_id)
+            if entry is None or entry[0] != fire_at:
+                continue
+            del self._next[guild_id]
+            due.append((guild_id, entry[1], fire_at))
+        return due
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# METRICS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Every metric, in registration order (rendered by /metrics)
+METRICS: list = []
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    """Render a Prometheus label set, e.g. {command="quote",phase="send"}."""
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic count, optionally split by label values."""
+
+    kind = "counter"
+    __slots__ = ("name", "help", "labels", "values")
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values: dict[tuple, float] = {}
+        METRICS.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name + _format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    """Point-in-time value, optionally split by label values."""
+
+    kind = "gauge"
+    __slots__ = ()
+
+    def set(self, value: float, *label_values):
+        self.values[label_values] = value
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, optionally split by label values.
+
+    Observing is a bisect and three increments; counts are only made
+    cumulative when scraped.
+    """
+
+    kind = "histogram"
+    __slots__ = ("name", "help", "labels", "buckets", "values")
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.values: dict[tuple, list] = {}  # label values -> [per-bucket counts, sum, count]
+        METRICS.append(self)
+
+    def observe(self, value: float, *label_values):
+        state = self.values.get(label_values)
+        if state is None:
+            state = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self):
+        for label_values, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                yield self.name + "_bucket" + _format_labels(self.labels, label_values, f'le="{bound}"'), cumulative
+            yield self.name + "_sum" + _format_labels(self.labels, label_values), total
+            yield self.name + "_count" + _format_labels(self.labels, label_values), count
+
+
+class CallbackMetric:
+    """Metric read from live state at scrape time; `collect()` yields (label values, value)."""
+
+    __slots__ = ("name", "help", "kind", "labels", "collect")
+
+    def __init__(self, name: str, help: str, kind: str, collect, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.kind, self.labels, self.collect = name, help, kind, labels, collect
+        METRICS.append(self)
+
+    def samples(self):
+        for label_values, value in self.collect():
+            yield self.name + _format_labels(self.labels, label_values), value
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name} {value}" for name, value in metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server(host: str, port: int) -> "web.AppRunner":
+    """Serve /metrics over HTTP. Returns the runner, to be cleaned up on shutdown."""
+    from aiohttp import web  # only needed with metrics enabled, so not imported at startup
+
+    async def handle_metrics(request: "web.Request") -> "web.Response":
+        return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("Metrics endpoint listening", extra={"url": f"http://{host}:{port}/metrics"})
+    return runner
+
+
+# Fallback start time for process_uptime() where /proc isn't available
+MODULE_LOADED_AT = time.monotonic()
+
+# Seconds from process start until the gateway first became ready (None until then)
+ready_after: float | None = None
+
+
+def process_uptime() -> float:
+    """Seconds since this process started (since this module loaded, without /proc)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rpartition(")")[2].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, AttributeError):
+        return time.monotonic() - MODULE_LOADED_AT
+
+
+def process_memory() -> tuple[int, int]:
+    """(current, peak) resident set size of this process in bytes (0 if unknown)."""
+    peak = 0
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        current = peak
+    return current, peak
+
+
+def log_startup(stage: str, **fields):
+    """Log time since process start and memory use at a startup milestone."""
+    current, peak = process_memory()
+    log.info("Startup stage reached", extra={
+        "stage": stage,
+        "seconds": round(process_uptime(), 3),
+        "rss_mb": round(current / 2**20, 1),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "low_memory": LOW_MEMORY,
+        **fields,
+    })
+
+
+@dataclass(slots=True)
+class CommandTiming:
+    """Phase timestamps for one command invocation (perf_counter seconds)."""
+
+    received: float
+    parsed: float = 0.0
+    replied: bool = False
+
+
+# Timing of the command running in the current task (None when metrics are disabled)
+command_timing: ContextVar[CommandTiming | None] = ContextVar("command_timing", default=None)
+
+commands_total = Counter("stoic_commands_total", "Commands invoked, after checks and argument parsing", ("command",))
+command_errors_total = Counter("stoic_command_errors_total", "Commands that were throttled, rejected or failed", ("command", "reason"))
+command_phase_seconds = Histogram(
+    "stoic_command_phase_seconds",
+    "Command latency by phase: parse (receive to handler), build (handler to first reply) and send (each reply)",
+    ("command", "phase"),
+)
+gateway_events_total = Counter("stoic_gateway_events_total", "Gateway dispatch events received", ("event",))
+quote_fetch_seconds = Histogram(
+    "stoic_quote_fetch_seconds", "Duration of corpus refreshes from all quote sources",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+quote_fetch_failures_total = Counter("stoic_quote_fetch_failures_total", "Quote sources (or whole refreshes) that failed", ("source",))
+event_loop_lag_seconds = Histogram(
+    "stoic_event_loop_lag_seconds", "Delay before a just-yielded task resumes on the event loop",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BOT SETUP
+# ═══════════════════════════════════════════════════════════════════════════════
+
+if LOW_MEMORY:
+    # Only what the commands use: guilds and channels, plus message events for prefix commands
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = intents.dm_messages = MESSAGE_CONTENT_INTENT
+else:
+    intents = discord.Intents.default()
+intents.message_content = MESSAGE_CONTENT_INTENT
+if not MESSAGE_CONTENT_INTENT:
+    intents.messages = False  # prefix commands can't be parsed, so skip message events too
+
+# The low-memory profile keeps no message history and caches no members but the bot itself
+cache_options = {"max_messages": None, "member_cache_flags": discord.MemberCacheFlags.none()} if LOW_MEMORY else {}
+
+if SHARD_MODE == "single":
+    bot = commands.Bot(command_prefix="!", intents=intents, help_command=None, **cache_options)
+else:
+    bot = commands.AutoShardedBot(
+        command_prefix="!", intents=intents, help_command=None,
+        shard_ids=SHARD_IDS, shard_count=SHARD_COUNT, **cache_options,
+    )
+
+# Raw quotes grouped by author - the source for merges and snapshots
+quotes_by_author: dict[str, list[str]] = {}
+
+# Hashes of the quotes in quotes_by_author that came from QUOTE_SOURCES files (a reload re-reads them)
+file_quote_hashes: set[int] = set()
+
+# Read-only index used by all commands (replaced wholesale on every corpus load)
+quote_index = QuoteIndex.build({}, 0)
+
+# ETag of the last API response
+quotes_etag: str | None = None
+
+# Shared HTTP session, created lazily on first use
+http_session: aiohttp.ClientSession | None = None
+
+# Outbound message scheduler shared by all commands and events
+outbound = SendScheduler(CHANNEL_SEND_RATE, CHANNEL_SEND_BURST, GLOBAL_SEND_RATE, SEND_COALESCE_SECONDS)
+
+
+# Deferral tasks for slash commands that are taking a while (interaction id -> task)
+pending_defers: dict[int, asyncio.Task] = {}
+
+# Interactions whose response is being sent; run_slash must not defer them
+answering_interactions: set[int] = set()
+
+
+async def reply(ctx, content: str = None, **kwargs):
+    """Reply to a prefix or slash command.
+
+    Prefix commands send a channel message through the outbound scheduler.
+    Slash commands answer their interaction, which has its own rate limits.
+    """
+    timing = command_timing.get()
+    if timing is not None:
+        started = time.perf_counter()
+        # Replies from error handlers (e.g. throttled commands) never passed before_invoke
+        if not timing.replied and timing.parsed:
+            timing.replied = True
+            command_phase_seconds.observe(started - timing.parsed, ctx.command.qualified_name, "build")
+
+    if isinstance(ctx, discord.ApplicationContext):
+        interaction_id = ctx.interaction.id
+        answering_interactions.add(interaction_id)
+        try:
+            deferring = pending_defers.get(interaction_id)
+            if deferring is not None:
+                # A failed deferral is logged by run_slash; respond normally then
+                await asyncio.wait([deferring])
+            result = await ctx.respond(content, **kwargs)
+        finally:
+            answering_interactions.discard(interaction_id)
+    else:
+        result = await outbound.send(ctx.channel.id, ctx.send, PRIORITY_INTERACTIVE, content=content, **kwargs)
+
+    if timing is not None:
+        command_phase_seconds.observe(time.perf_counter() - started, ctx.command.qualified_name, "send")
+    return result
+
+
+# Storage for user personas (user_id -> author_name)
+persona_store = WriteBehindStore(
+    open_store_backend(STATE_STORE_URL, "personas"), PERSONA_CACHE_SIZE, ttl=STATE_CACHE_TTL,
+)
+
+# Storage for guild settings (guild_id -> GuildSettings), loaded lazily per guild
+guild_store = WriteBehindStore(
+    open_store_backend(STATE_STORE_URL, "guild_settings"), GUILD_CACHE_SIZE,
+    encode=GuildSettings.to_json, decode=GuildSettings.from_json, ttl=STATE_CACHE_TTL,
+)
+
+
+# Storage for no-repeat quote cursors (user_id -> packed cursor int)
+cursor_store = WriteBehindStore(
+    open_store_backend(STATE_STORE_URL, "quote_cursors"), PERSONA_CACHE_SIZE, encode=str, decode=int,
+    ttl=STATE_CACHE_TTL,
+)
+
+# Storage for daily quote subscriptions (guild_id -> DailySubscription)
+daily_store = WriteBehindStore(
+    open_store_backend(STATE_STORE_URL, "daily_quotes"), GUILD_CACHE_SIZE,
+    encode=DailySubscription.to_json, decode=DailySubscription.from_json,
+)
+daily_schedule = DailySchedule()
+
+# Every store flushed by the background task and on shutdown, by name
+state_stores = {
+    "personas": persona_store,
+    "guild_settings": guild_store,
+    "quote_cursors": cursor_store,
+    "daily_quotes": daily_store,
+}
+
+
+async def next_unseen_quote(user_id: int, author: str) -> str | None:
+    """Next quote in the user's shuffled walk through an author's quotes."""
+    index = quote_index
+    author_range = index.author_range(author)
+    if author_range is None:
+        return None
+    start, end = author_range
+    position, cursor = advance_cursor(await cursor_store.get(user_id), author, end - start,
+                                      lambda i: index.quotes[start + i])
+    cursor_store.set(user_id, cursor)
+    return index.quotes[start + position]
+
+
+async def get_guild_settings(guild_id: int | None) -> GuildSettings:
+    """Return a guild's settings (defaults for DMs and unknown guilds)."""
+    if guild_id is None:
+        return NO_GUILD_SETTINGS
+    return await guild_store.get(guild_id, NO_GUILD_SETTINGS)
+
+
+async def resolve_persona(ctx) -> str:
+    """Resolve the persona for a command: the user's choice, then the guild default, then global."""
+    persona = await persona_store.get(ctx.author.id)
+    if persona is None:
+        persona = (await get_guild_settings(ctx.guild.id if ctx.guild else None)).default_persona
+    return persona or DEFAULT_PERSONA
+
+
+# Sliding-window counters for command throttling
+command_limiter = SlidingWindowLimiter(THROTTLE_WINDOW_SECONDS, THROTTLE_SLOTS)
+
+
+@bot.check
+async def throttle_commands(ctx) -> bool:
+    """Global check: reject invocations over their per-user or per-guild limit before they run."""
+    name = ctx.command.name
+    now = time.monotonic()
+    user_limit = USER_COMMAND_LIMITS.get(name, DEFAULT_USER_COMMAND_LIMIT)
+    guild_limit = GUILD_COMMAND_LIMIT
+
+    if ctx.guild is not None:
+        settings = await get_guild_settings(ctx.guild.id)
+        if settings.command_limits:
+            user_limit = settings.command_limits.get(name, user_limit)
+        if settings.guild_command_limit is not None:
+            guild_limit = settings.guild_command_limit
+
+    rejected = command_limiter.hit(hash((name, ctx.author.id)), user_limit, now)
+    if not rejected and ctx.guild is not None:
+        rejected = command_limiter.hit(hash((name, "guild", ctx.guild.id)), guild_limit, now)
+    if rejected:
+        retry_after = THROTTLE_WINDOW_SECONDS - now % THROTTLE_WINDOW_SECONDS
+        raise CommandThrottled(name, retry_after, first=rejected == 1)
+    return True
+
+
+def shard_latency(guild) -> tuple[int | None, float]:
+    """Return (shard id, latency in seconds) for the shard serving a guild."""
+    if isinstance(bot, commands.AutoShardedBot):
+        shard_id = guild.shard_id if guild else (bot.shard_ids or [0])[0]
+        shard = bot.get_shard(shard_id)
+        if shard is not None:
+            return shard_id, shard.latency
+    return bot.shard_id, bot.latency
+
+
+def format_latency(seconds: float) -> str:
+    """Format a gateway latency in milliseconds (unknown until the first heartbeat)."""
+    return "—" if math.isnan(seconds) or math.isinf(seconds) else f"{round(seconds * 1000)}ms"
+
+
+def format_shard_latencies(limit: int = 10) -> str:
+    """List per-shard latencies for this process, one shard per line."""
+    latencies = bot.latencies if isinstance(bot, commands.AutoShardedBot) else [(bot.shard_id or 0, bot.latency)]
+    lines = [f"`#{shard_id}` {format_latency(latency)}" for shard_id, latency in latencies[:limit]]
+    if len(latencies) > limit:
+        lines.append(f"…and {len(latencies) - limit} more")
+    return "\n".join(lines) or "—"
+
+
+def outbound_metric(key: str):
+    return lambda: [((), outbound.stats()[key])]
+
+
+CallbackMetric("stoic_quotes", "Quotes in the loaded corpus", "gauge", lambda: [((), quote_index.total)])
+CallbackMetric("stoic_quote_authors", "Authors in the loaded corpus", "gauge", lambda: [((), len(quote_index.authors))])
+CallbackMetric("stoic_guilds", "Guilds served by this process", "gauge", lambda: [((), len(bot.guilds))])
+CallbackMetric("stoic_resident_memory_bytes", "Resident set size of this process", "gauge", lambda: [((), process_memory()[0])])
+CallbackMetric(
+    "stoic_startup_seconds", "Seconds from process start until the gateway was first ready", "gauge",
+    lambda: [((), ready_after)] if ready_after is not None else [],
+)
+CallbackMetric(
+    "stoic_gateway_latency_seconds", "Heartbeat latency per shard", "gauge",
+    lambda: [
+        ((shard_id,), latency)
+        for shard_id, latency in (bot.latencies if isinstance(bot, commands.AutoShardedBot) else [(bot.shard_id or 0, bot.latency)])
+        if math.isfinite(latency)
+    ],
+    ("shard",),
+)
+CallbackMetric(
+    "stoic_state_cache_hits_total", "State store lookups answered from memory", "counter",
+    lambda: [((name,), store.hits) for name, store in state_stores.items()], ("store",),
+)
+CallbackMetric(
+    "stoic_state_cache_misses_total", "State store lookups that went to the backend", "counter",
+    lambda: [((name,), store.misses) for name, store in state_stores.items()], ("store",),
+)
+CallbackMetric("stoic_outbound_queue_depth", "Messages waiting in the outbound scheduler", "gauge", outbound_metric("queue_depth"))
+CallbackMetric("stoic_outbound_max_queue_depth", "Largest outbound queue depth seen", "gauge", outbound_metric("max_queue_depth"))
+CallbackMetric("stoic_outbound_active_channels", "Channels with queued outbound messages", "gauge", outbound_metric("active_channels"))
+CallbackMetric("stoic_outbound_sent_total", "Messages sent by the outbound scheduler", "counter", outbound_metric("sent"))
+CallbackMetric("stoic_outbound_coalesced_total", "Duplicate messages collapsed into one send", "counter", outbound_metric("coalesced"))
+CallbackMetric("stoic_outbound_dropped_total", "Messages cancelled before they were sent", "counter", outbound_metric("dropped"))
+CallbackMetric("stoic_outbound_wait_avg_ms", "Average time messages spent queued", "gauge", outbound_metric("avg_wait_ms"))
+CallbackMetric("stoic_outbound_wait_max_ms", "Longest time a message spent queued", "gauge", outbound_metric("max_wait_ms"))
+CallbackMetric("stoic_daily_subscriptions", "Daily quote subscriptions scheduled here", "gauge", lambda: [((), len(daily_schedule))])
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# QUOTE SNAPSHOT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Snapshot layout: header, ETag, author table, quote offset table, per-quote source flags
+# (format 2 and up), UTF-8 quote blob. Format 1 snapshots still load, with no flags set.
+SNAPSHOT_MAGIC = b"STQC"
+SNAPSHOT_FORMAT = 2
+_SNAPSHOT_FROM_FILE = 1  # source flag: the quote came from a QUOTE_SOURCES file
+_SNAPSHOT_HEADER = struct.Struct("<4sHHQII")  # magic, format, ETag length, corpus version, authors, quotes
+_SNAPSHOT_AUTHOR = struct.Struct("<HII")  # name length, first quote, end quote
+_SNAPSHOT_OFFSET = struct.Struct("<I")
+
+
+def compute_corpus_version(corpus: dict[str, list[str]]) -> int:
+    """Hash the corpus contents (in order) into a stable 64-bit version number."""
+    digest = hashlib.blake2b(digest_size=8)
+    for author, author_quotes in corpus.items():
+        digest.update(author.encode("utf-8") + b"\0")
+        for quote in author_quotes:
+            digest.update(quote.encode("utf-8") + b"\n")
+    return int.from_bytes(digest.digest(), "little")
+
+
+def encode_snapshot(corpus: dict[str, list[str]], etag: str | None = None,
+                    file_hashes: set[int] = frozenset()) -> bytes:
+    """Serialize a corpus into the compact snapshot format, flagging quotes whose hash is in `file_hashes`."""
+    etag_bytes = (etag or "").encode("utf-8")
+    author_table = bytearray()
+    offsets = bytearray(_SNAPSHOT_OFFSET.pack(0))
+    flags = bytearray()
+    blob = bytearray()
+    count = 0
+
+    for author, author_quotes in corpus.items():
+        name = author.encode("utf-8")
+        author_table += _SNAPSHOT_AUTHOR.pack(len(name), count, count + len(author_quotes)) + name
+        for quote in author_quotes:
+            blob += quote.encode("utf-8")
+            offsets += _SNAPSHOT_OFFSET.pack(len(blob))
+            flags.append(_SNAPSHOT_FROM_FILE if file_hashes and quote_hash(quote) in file_hashes else 0)
+        count += len(author_quotes)
+
+    header = _SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, len(etag_bytes),
+        compute_corpus_version(corpus), len(corpus), count,
+    )
+    return b"".join((header, etag_bytes, author_table, offsets, flags, blob))
+
+
+def parse_snapshot_layout(data) -> tuple[str | None, int, list[tuple[str, int, int]], array, bytes, int]:
+    """Parse the snapshot header and tables.
+
+    Returns (etag, version, author ranges, quote offsets, source flags, blob
+    position) without decoding any quote text. Raises ValueError if the
+    snapshot is invalid.
+    """
+    if len(data) < _SNAPSHOT_HEADER.size:
+        raise ValueError("snapshot is truncated")
+    magic, fmt, etag_len, version, author_count, quote_count = _SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or not 1 <= fmt <= SNAPSHOT_FORMAT:
+        raise ValueError(f"unsupported snapshot (magic={magic!r}, format={fmt})")
+
+    pos = _SNAPSHOT_HEADER.size
+    etag = data[pos:pos + etag_len].decode("utf-8") or None
+    pos += etag_len
+
+    ranges = []
+    for _ in range(author_count):
+        name_len, start, end = _SNAPSHOT_AUTHOR.unpack_from(data, pos)
+        pos += _SNAPSHOT_AUTHOR.size
+        ranges.append((data[pos:pos + name_len].decode("utf-8"), start, end))
+        pos += name_len
+
+    offsets = array("I", struct.unpack_from(f"<{quote_count + 1}I", data, pos))
+    pos += (quote_count + 1) * _SNAPSHOT_OFFSET.size
+    if fmt >= 2:
+        flags = bytes(data[pos:pos + quote_count])
+        pos += quote_count
+    else:
+        flags = bytes(quote_count)
+    if pos + offsets[-1] != len(data):
+        raise ValueError("snapshot is truncated")
+    return etag, version, ranges, offsets, flags, pos
+
+
+def decode_snapshot(data: bytes) -> tuple[dict[str, list[str]], str | None, int, set[int]]:
+    """Parse snapshot bytes into (corpus, etag, version, file quote hashes). Raises ValueError if invalid."""
+    etag, version, ranges, offsets, flags, pos = parse_snapshot_layout(data)
+    corpus = {
+        author: [data[pos + offsets[i]:pos + offsets[i + 1]].decode("utf-8") for i in range(start, end)]
+        for author, start, end in ranges
+    }
+    if compute_corpus_version(corpus) != version:
+        raise ValueError("snapshot checksum mismatch")
+    quotes = [quote for author_quotes in corpus.values() for quote in author_quotes]
+    file_hashes = {quote_hash(quote) for quote, flag in zip(quotes, flags) if flag & _SNAPSHOT_FROM_FILE}
+    return corpus, etag, version, file_hashes
+
+
+def write_file_atomic(path: str, data: bytes):
+    """Write a file so readers see either the old or the new contents (temp file, fsync, rename)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(path: str, corpus: dict[str, list[str]], etag: str | None = None,
+                   file_hashes: set[int] = frozenset()):
+    """Atomically write the corpus snapshot to disk."""
+    write_file_atomic(path, encode_snapshot(corpus, etag, file_hashes))
+
+
+def read_snapshot(path: str) -> tuple[dict[str, list[str]], str | None, int, set[int]] | None:
+    """Read the corpus snapshot from disk. Returns None if missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            return decode_snapshot(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+        log.warning("Ignoring unreadable quote snapshot", extra={"path": path, "error": str(e)})
+        return None
+
+
+class SnapshotQuotes(Sequence):
+    """Read-only quote sequence decoded on access from a memory-mapped snapshot.
+
+    Lets several worker processes share one copy of the quote text through the
+    page cache instead of each holding its own decoded corpus.
+    """
+
+    __slots__ = ("_buffer", "_base", "_offsets")
+
+    def __init__(self, buffer: mmap.mmap, base: int, offsets: array):
+        self._buffer = buffer
+        self._base = base
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        offsets = self._offsets
+        return self._buffer[self._base + offsets[i]:self._base + offsets[i + 1]].decode("utf-8")
+
+
+def map_snapshot(path: str) -> tuple[QuoteIndex, str | None]:
+    """Memory-map a snapshot file and build an index whose quotes live in the mapping."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    etag, version, ranges, offsets, _, pos = parse_snapshot_layout(buffer)
+    quotes = SnapshotQuotes(buffer, pos, offsets)
+    names = [author for author, _, _ in ranges]
+    index = QuoteIndex.from_ranges(version, names, [(start, end) for _, start, end in ranges], quotes)
+    return index, etag
+
+
+def install_index(index: QuoteIndex, etag: str | None, corpus: dict[str, list[str]] | None = None):
+    """Swap in a new index (and its raw corpus, if this process owns one) in one step."""
+    global quotes_by_author, quote_index, quotes_etag
+    quotes_by_author, quote_index, quotes_etag = corpus if corpus is not None else {}, index, etag
+    embed_cache.clear()
+
+
+def install_corpus(corpus: dict[str, list[str]], etag: str | None, version: int | None = None):
+    """Build the index for a new corpus and swap it in so commands never see a half-built state."""
+    if version is None:
+        version = compute_corpus_version(corpus)
+    install_index(QuoteIndex.build(corpus, version), etag, corpus)
+
+
+async def rebuild_corpus(corpus: dict[str, list[str]], etag: str | None, version: int | None = None):
+    """Like install_corpus, but builds the index in a worker thread so commands keep running."""
+    def build():
+        return QuoteIndex.build(corpus, compute_corpus_version(corpus) if version is None else version)
+    index = await asyncio.to_thread(build)
+    install_index(index, etag, corpus)
+
+
+def load_snapshot() -> bool:
+    """Warm start: load the on-disk snapshot into memory. Returns True if quotes were loaded."""
+    global file_quote_hashes
+    snapshot = read_snapshot(QUOTE_SNAPSHOT_PATH)
+    if not snapshot:
+        log.info("No quote snapshot, waiting for refresh", extra={"path": QUOTE_SNAPSHOT_PATH})
+        return False
+
+    corpus, etag, version, file_quote_hashes = snapshot
+    install_corpus(corpus, etag, version)
+    log.info("Loaded quote snapshot", extra={"quotes": quote_index.total, "version": f"{version:016x}"})
+    return True
+
+
+# Modification time of the currently mapped snapshot (shared corpus readers only)
+snapshot_mtime: int | None = None
+
+
+def read_shared_snapshot() -> tuple[int, QuoteIndex, str | None] | None:
+    """Map the snapshot written by worker 0. Returns (mtime, index, etag), or None if unavailable."""
+    try:
+        mtime = os.stat(QUOTE_SNAPSHOT_PATH).st_mtime_ns
+        return (mtime, *map_snapshot(QUOTE_SNAPSHOT_PATH))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+        log.warning("Ignoring unreadable quote snapshot", extra={"path": QUOTE_SNAPSHOT_PATH, "error": str(e)})
+        return None
+
+
+def load_shared_snapshot(snapshot: tuple[int, QuoteIndex, str | None] | None = None) -> bool:
+    """Install worker 0's snapshot, reading it now unless given. Returns True if quotes were loaded."""
+    global snapshot_mtime
+    if snapshot is None:
+        snapshot = read_shared_snapshot()
+        if snapshot is None:
+            return False
+
+    mtime, index, etag = snapshot
+    install_index(index, etag)
+    snapshot_mtime = mtime
+    log.info("Mapped shared quote snapshot", extra={"quotes": index.total, "version": f"{index.version:016x}"})
+    return True
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# QUOTE FETCHING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared HTTP session (pooled, with bounded concurrency), creating it on first use."""
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=QUOTE_FETCH_CONCURRENCY, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=QUOTE_FETCH_TIMEOUT),
+        )
+    return http_session
+
+
+def normalize_quote(text: str) -> str:
+    """Canonical form of a quote: NFC, trimmed, single-spaced, without wrapping quote marks."""
+    text = " ".join(unicodedata.normalize("NFC", text).split())
+    return text.strip("\"“”'‘’ ")
+
+
+def quote_hash(text: str) -> int:
+    """Content hash used to dedupe quotes across sources (case-insensitive)."""
+    return int.from_bytes(hashlib.blake2b(text.casefold().encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class QuoteIngestor:
+    """Merges quote records from any number of sources into one new corpus, in a single pass.
+
+    Records are normalized and deduplicated by content hash as they arrive,
+    so sources can stream into it concurrently without buffering.
+    """
+
+    def __init__(self, base: dict[str, list[str]], file_hashes: set[int] = frozenset()):
+        self.corpus = {author: list(author_quotes) for author, author_quotes in base.items()}
+        self.seen = {quote_hash(quote) for author_quotes in base.values() for quote in author_quotes}
+        self.author_names = {normalize_name(author): author for author in (*AUTHOR_BIOS, *base)}
+        self.file_hashes = set(file_hashes)  # quotes a file source provided, in the base or since
+        self.added = 0
+
+    def add(self, author: str | None, text: str | None, from_file: bool = False) -> bool:
+        """Add one record. Returns False if it is empty or a duplicate."""
+        text = normalize_quote(text or "")
+        if not text:
+            return False
+        digest = quote_hash(text)
+        if from_file:
+            self.file_hashes.add(digest)
+        if digest in self.seen:
+            return False
+        self.seen.add(digest)
+
+        # Merge spelling variants of an author ("marcus aurelius") into the known or first-seen name
+        author = " ".join((author or "Unknown").split()) or "Unknown"
+        author = self.author_names.setdefault(normalize_name(author), author)
+        self.corpus.setdefault(author, []).append(text)
+        self.added += 1
+        return True
+
+
+async def iter_json_array(chunks):
+    """Yield the elements of a top-level JSON array as its bytes arrive.
+
+    Only the unparsed tail of the stream is buffered, so memory stays
+    proportional to one element rather than the whole response.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, started, closed = "", 0, False, False
+
+    def complete_elements(final: bool):
+        """Yield the elements that are complete in the buffer, advancing `pos` past them."""
+        nonlocal pos, started, closed
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                return
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                closed = True
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                return  # element continues in the next chunk
+            # A number cut at the chunk boundary still decodes ("12" of "12345", "1" of "1.5"),
+            # so an element only counts once a delimiter follows it
+            if end == len(buffer) or buffer[end] not in " \t\r\n,]":
+                if not final:
+                    return
+                if end < len(buffer):
+                    raise ValueError("malformed JSON array")
+            pos = end
+            yield item
+
+    async for chunk in chunks:
+        buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+        for item in complete_elements(final=False):
+            yield item
+        if closed:
+            return
+
+    buffer = buffer[pos:] + utf8.decode(b"", final=True)
+    pos = 0
+    for item in complete_elements(final=True):
+        yield item
+    if not closed:
+        raise ValueError("truncated JSON array")
+
+
+async def ingest_api_page(ingestor: QuoteIngestor, page: int, conditional: bool = True) -> tuple[int, str | None]:
+    """Stream one API response into the ingestor. Returns (quotes added, ETag)."""
+    # Conditional requests only make sense for the first sample; the rest are extra samples
+    headers = {"If-None-Match": quotes_etag} if conditional and quotes_etag and page == 0 else {}
+
+    async with get_http_session().get(STOIC_API_URL, headers=headers) as response:
+        if response.status == 304:
+            return 0, None
+        if response.status != 200:
+            raise ValueError(f"HTTP {response.status}")
+
+        added = 0
+        async for quote in iter_json_array(response.content.iter_chunked(QUOTE_STREAM_CHUNK)):
+            if isinstance(quote, dict):
+                added += ingestor.add(quote.get("author"), quote.get("text"))
+        return added, response.headers.get("ETag") if page == 0 else None
+
+
+async def ingest_file(ingestor: QuoteIngestor, path: str) -> tuple[int, None]:
+    """Stream a local .jsonl or .csv file (author/text columns) into the ingestor. Returns (quotes added, None)."""
+    added = 0
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for i, record in enumerate(records, 1):
+            added += ingestor.add(record.get("author"), record.get("text") or record.get("quote"), from_file=True)
+            if i % 1000 == 0:
+                await asyncio.sleep(0)  # let commands run during large imports
+    return added, None
+
+
+# Errors a corpus refresh or reload can hit; they are logged and the current corpus kept
+QUOTE_FETCH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError)
+
+# Serializes corpus rebuilds, so a reload and the scheduled refresh never race each other
+corpus_lock = asyncio.Lock()
+
+
+async def fetch_quotes(force: bool = False) -> bool:
+    """Ingest quotes from every configured source and merge them into the corpus.
+
+    With `force`, quotes from source files are rebuilt from scratch, so quotes
+    removed or reordered in a file take effect, and the API is asked for a full
+    response even if its ETag hasn't changed. API quotes are still merged into
+    the ones collected so far, since each request only returns a random sample.
+    A forced rebuild is abandoned if a file fails to load. Returns True if the
+    corpus changed.
+    """
+    async with corpus_lock:
+        return await _fetch_quotes(force)
+
+
+async def _fetch_quotes(force: bool) -> bool:
+    global file_quote_hashes
+    if force:
+        base = {author: kept for author, author_quotes in quotes_by_author.items()
+                if (kept := [quote for quote in author_quotes if quote_hash(quote) not in file_quote_hashes])}
+        ingestor = QuoteIngestor(base)
+    else:
+        ingestor = QuoteIngestor(quotes_by_author, file_quote_hashes)
+    jobs, labels = [], []
+    for source in QUOTE_SOURCES:
+        if source == "api":
+            for page in range(QUOTE_API_PAGES):
+                jobs.append(ingest_api_page(ingestor, page, conditional=not force))
+                labels.append(f"api request {page + 1}")
+        else:
+            jobs.append(ingest_file(ingestor, source))
+            labels.append(source)
+
+    etag, failed = quotes_etag, []
+    for label, result in zip(labels, await asyncio.gather(*jobs, return_exceptions=True)):
+        if isinstance(result, Exception):
+            quote_fetch_failures_total.inc(label)
+            log.error("Failed to ingest quotes", extra={"source": label, "error": str(result)})
+            if label in QUOTE_SOURCES:
+                failed.append(label)
+            continue
+        added, source_etag = result
+        etag = source_etag or etag
+        log.info("Ingested quote source", extra={"source": label, "added": added})
+
+    version = None
+    if force:
+        # Rebuilding without a file that failed to load would drop its quotes
+        if failed:
+            raise ValueError(f"could not ingest {', '.join(failed)}")
+        version = await asyncio.to_thread(compute_corpus_version, ingestor.corpus)
+        if version == quote_index.version:
+            log.info("Quote corpus unchanged")
+            return False
+    elif not ingestor.added and etag == quotes_etag:
+        log.info("Quote corpus unchanged")
+        return False
+
+    await rebuild_corpus(ingestor.corpus, etag, version)
+    file_quote_hashes = ingestor.file_hashes
+
+    # Log the results
+    log.info("Loaded quote corpus", extra={
+        "quotes": quote_index.total,
+        "added": ingestor.added,
+        "authors": {author: quote_index.count(author) for author in quote_index.authors},
+    })
+
+    await asyncio.to_thread(write_snapshot, QUOTE_SNAPSHOT_PATH, ingestor.corpus, etag, ingestor.file_hashes)
+    return True
+
+
+async def reload_shared_snapshot() -> bool:
+    """Map worker 0's snapshot in a worker thread, then swap it in. Returns True if quotes were loaded."""
+    async with corpus_lock:
+        snapshot = await asyncio.to_thread(read_shared_snapshot)
+        return snapshot is not None and load_shared_snapshot(snapshot)
+
+
+async def wait_for_shared_snapshot(timeout: float) -> bool:
+    """Wait for worker 0 to replace the shared snapshot, then map it. Returns True if a new one was loaded."""
+    mapped = snapshot_mtime
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if snapshot_mtime != mapped:
+            return True  # watch_snapshot got to it first
+        try:
+            mtime = os.stat(QUOTE_SNAPSHOT_PATH).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime != mapped:
+            return await reload_shared_snapshot()
+        await asyncio.sleep(SHARED_RELOAD_POLL_SECONDS)
+    log.info("Shared quote snapshot not replaced, keeping the current one", extra={"waited_seconds": timeout})
+    return False
+
+
+@tasks.loop(seconds=SNAPSHOT_WATCH_SECONDS)
+async def watch_snapshot():
+    """Pick up the shared snapshot whenever worker 0 replaces it."""
+    try:
+        mtime = os.stat(QUOTE_SNAPSHOT_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return
+    if mtime != snapshot_mtime:
+        await reload_shared_snapshot()
+
+
+@tasks.loop(hours=QUOTE_REFRESH_HOURS)
+async def refresh_quotes():
+    """Refresh the quote corpus from its sources in the background."""
+    started = time.perf_counter()
+    try:
+        await fetch_quotes()
+    except QUOTE_FETCH_ERRORS as e:
+        quote_fetch_failures_total.inc("refresh")
+        log.error("Failed to refresh quotes", extra={"error": str(e)})
+    finally:
+        quote_fetch_seconds.observe(time.perf_counter() - started)
+
+
+@refresh_quotes.before_loop
+async def wait_for_refresh_due():
+    """Skip the refresh at startup while the snapshot just loaded is younger than the refresh interval."""
+    try:
+        age = time.time() - os.stat(QUOTE_SNAPSHOT_PATH).st_mtime
+    except OSError:
+        return
+    remaining = QUOTE_REFRESH_HOURS * 3600 - age
+    if quote_index.total and remaining > 0:
+        log.info("Quote snapshot is fresh, next refresh scheduled", extra={"in_seconds": round(remaining)})
+        await asyncio.sleep(remaining)
+    else:
+        log.info("Refreshing quotes in the background")
+
+
+async def reload_corpus(trigger: str) -> bool:
+    """Rebuild the corpus and its indexes in the background, then swap them in.
+
+    Workers that share worker 0's snapshot wait for it to be rewritten and
+    re-map it instead. Returns True if the corpus changed; fetch errors are
+    counted and re-raised.
+    """
+    log.info("Reloading quote corpus", extra={"trigger": trigger})
+    started = time.perf_counter()
+    try:
+        if SHARED_CORPUS_READER:
+            changed = await wait_for_shared_snapshot(SHARED_RELOAD_TIMEOUT)
+        else:
+            changed = await fetch_quotes(force=True)
+    except QUOTE_FETCH_ERRORS:
+        quote_fetch_failures_total.inc("reload")
+        raise
+    finally:
+        quote_fetch_seconds.observe(time.perf_counter() - started)
+    log.info("Reloaded quote corpus", extra={"trigger": trigger, "changed": changed, "quotes": quote_index.total})
+    return changed
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# GATEWAY SESSIONS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Close code that ends a connection but keeps its session resumable (1000 and 1001 end the session)
+RESUMABLE_CLOSE_CODE = 4000
+
+# Version of the saved gateway state; files with any other version are discarded
+GATEWAY_STATE_FORMAT = 1
+
+# Sessions restored from the last run, by shard, waiting for that shard's first connection
+pending_resumes: dict[int, dict] = {}
+
+# Shards whose cache was restored from the last run and that haven't fallen back to IDENTIFY
+restored_shards: set[int] = set()
+
+
+def guild_shard(guild_id: int, shard_count: int | None) -> int:
+    """The shard Discord routes a guild's events to."""
+    return (guild_id >> 22) % shard_count if shard_count else 0
+
+
+def serves_guild(guild_id: int) -> bool:
+    """Whether one of this process's shards serves a guild (cached or not)."""
+    shard_ids = getattr(bot, "shard_ids", None) or range(bot.shard_count or 1)
+    return guild_shard(guild_id, bot.shard_count) in shard_ids
+
+
+def gateway_websockets() -> dict[int, "discord.gateway.DiscordWebSocket"]:
+    """This process's gateway connections, by shard id."""
+    if isinstance(bot, commands.AutoShardedBot):
+        return {shard_id: bot._get_websocket(shard_id=shard_id) for shard_id in bot.shards}
+    return {} if bot.ws is None else {bot.shard_id or 0: bot.ws}
+
+
+def keep_resumable(ws):
+    """Make py-cord's close() (always code 1000, which ends the session) use a resumable code."""
+    close = ws.close
+
+    async def resumable_close(code: int = RESUMABLE_CLOSE_CODE):
+        await close(code=RESUMABLE_CLOSE_CODE)
+
+    ws.close = resumable_close
+
+
+def guild_payload(guild: discord.Guild) -> dict:
+    """A minimal GUILD_CREATE payload: roles (for permission checks) and text channels (for sends)."""
+    return {
+        "id": str(guild.id),
+        "name": guild.name,
+        "owner_id": str(guild.owner_id) if guild.owner_id else None,
+        "member_count": guild.member_count,
+        "roles": [
+            {"id": str(role.id), "name": role.name, "permissions": str(role.permissions.value),
+             "position": role.position, "colors": {"primary_color": role.colours.primary.value}}
+            for role in guild.roles
+        ],
+        "channels": [
+            {"id": str(channel.id), "type": channel.type.value, "name": channel.name,
+             "position": channel.position, "parent_id": str(channel.category_id) if channel.category_id else None}
+            for channel in guild.text_channels
+        ],
+    }
+
+
+def capture_gateway_state() -> dict | None:
+    """Each shard's session plus the cached state a RESUME won't resend. None if nothing is resumable."""
+    sessions = {
+        str(shard_id): {"session_id": ws.session_id, "sequence": ws.sequence, "resume_gateway_url": ws.resume_gateway_url}
+        for shard_id, ws in gateway_websockets().items()
+        if ws is not None and ws.session_id and ws.sequence is not None and ws.resume_gateway_url
+    }
+    if not sessions:
+        return None
+    return {
+        "format": GATEWAY_STATE_FORMAT,
+        "saved_at": time.time(),
+        "shard_count": bot.shard_count,
+        "application_id": bot.application_id,
+        "sessions": sessions,
+        "guilds": [guild_payload(guild) for guild in bot.guilds if str(guild_shard(guild.id, bot.shard_count)) in sessions],
+    }
+
+
+def save_gateway_state(path: str, state: dict):
+    """Atomically write the captured gateway state."""
+    write_file_atomic(path, json.dumps(state, separators=(",", ":")).encode("utf-8"))
+
+
+def gateway_state_problem(state) -> str | None:
+    """Why a saved gateway state can't be restored (wrong format or shape), or None if it can."""
+    if not isinstance(state, dict) or state.get("format") != GATEWAY_STATE_FORMAT:
+        return "unknown format"
+    if not isinstance(state.get("saved_at"), (int, float)):
+        return "missing saved_at"
+    if not isinstance(state.get("application_id"), (int, type(None))):
+        return "bad application_id"
+    sessions = state.get("sessions")
+    if not isinstance(sessions, dict) or not all(
+        shard_id.isdigit() and isinstance(session, dict)
+        and isinstance(session.get("session_id"), str) and isinstance(session.get("sequence"), int)
+        and isinstance(session.get("resume_gateway_url"), str)
+        for shard_id, session in sessions.items()
+    ):
+        return "bad sessions"
+    guilds = state.get("guilds")
+    if not isinstance(guilds, list) or not all(
+        isinstance(guild, dict) and str(guild.get("id", "")).isdigit()
+        and isinstance(guild.get("roles", []), list) and isinstance(guild.get("channels", []), list)
+        for guild in guilds
+    ):
+        return "bad guilds"
+    return None
+
+
+def take_gateway_state(path: str) -> dict | None:
+    """Read and delete the saved gateway state - a session is only worth one RESUME attempt.
+
+    Returns None if there is none, it is unreadable or malformed, too old, or
+    from a different shard layout.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        os.remove(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable gateway sessions", extra={"path": path, "error": str(e)})
+        return None
+
+    problem = gateway_state_problem(state)
+    if problem is not None:
+        log.warning("Ignoring invalid gateway sessions", extra={"path": path, "error": problem})
+        return None
+    age = time.time() - state["saved_at"]
+    if age > GATEWAY_RESUME_MAX_AGE:
+        log.info("Saved gateway sessions expired", extra={"age_seconds": round(age)})
+        return None
+    if state.get("shard_count") != bot.shard_count:
+        log.info("Shard layout changed, not resuming", extra={"saved": state.get("shard_count"), "current": bot.shard_count})
+        return None
+    return state
+
+
+def restore_gateway_state(path: str) -> int:
+    """Queue saved sessions for RESUME and restore the cache they were built on. Returns how many shards."""
+    state = take_gateway_state(path)
+    if state is None:
+        return 0
+
+    shard_ids = set(getattr(bot, "shard_ids", None) or range(bot.shard_count or 1))
+    for shard_id, session in state["sessions"].items():
+        if int(shard_id) in shard_ids:
+            pending_resumes[int(shard_id)] = session
+    if not pending_resumes:
+        return 0
+
+    # A resumed session only replays missed events: there is no READY, so no guild list or
+    # application id (login still fetches the bot user). Restore them from the last run first,
+    # so the replayed events land on a warm cache.
+    connection = bot._connection
+    connection.application_id = state["application_id"]
+    for data in state["guilds"]:
+        if guild_shard(int(data["id"]), bot.shard_count) in pending_resumes:
+            connection._add_guild_from_data(data)
+    restored_shards.update(pending_resumes)
+
+    discord.gateway.DiscordWebSocket.from_client = classmethod(connect_gateway)
+    log.info("Restored gateway sessions", extra={"shards": sorted(pending_resumes), "guilds": len(bot.guilds)})
+    return len(pending_resumes)
+
+
+_from_client = discord.gateway.DiscordWebSocket.from_client
+
+
+async def connect_gateway(cls, client, *, shard_id: int | None = None, resume: bool = False, **params):
+    """DiscordWebSocket.from_client, except a shard's first connection resumes its saved session.
+
+    If Discord rejects the session, py-cord reconnects without `resume` and we
+    drop that shard's restored guilds, so the READY that follows rebuilds them.
+    """
+    shard = shard_id or 0
+    saved = pending_resumes.pop(shard, None)
+    if saved is not None and not resume:
+        params["gateway"] = f"{saved['resume_gateway_url']}?encoding=json&v={discord.http.API_VERSION}&compress=zlib-stream"
+        params["session"], params["sequence"], resume = saved["session_id"], saved["sequence"], True
+        log.info("Resuming gateway session", extra={"shard_id": shard, "sequence": saved["sequence"]})
+    elif not resume and shard in restored_shards:
+        restored_shards.discard(shard)
+        connection = client._connection
+        for guild in [g for g in connection.guilds if guild_shard(g.id, client.shard_count) == shard]:
+            connection._remove_guild(guild)
+        log.info("Saved gateway session rejected, identifying", extra={"shard_id": shard})
+    return await _from_client.__func__(cls, client, shard_id=shard_id, resume=resume, **params)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EMBED RENDERING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Discord rejects embeds over these limits
+EMBED_MAX_FIELDS = 25
+EMBED_MAX_FIELD_NAME = 256
+EMBED_MAX_CHARS = 6000
+
+# Characters !authors fills with philosophers, leaving room for its footer and "…and N more" line
+AUTHORS_EMBED_BUDGET = EMBED_MAX_CHARS - 512
+
+# Command reference shown by !help (also used as slash command descriptions)
+COMMAND_DESCRIPTIONS = {
+    "authors": "List all available philosophers and their quote counts",
+    "persona": "Select a philosopher persona",
+    "bio": "Learn about your selected philosopher's life and teachings",
+    "quote": "Get a random quote from your selected philosopher",
+    "search": "Find quotes about a topic from any philosopher",
+    "random": "Get a random quote from any philosopher",
+    "help": "Show this help message",
+    "ping": "Check bot latency",
+    "info": "Display bot information",
+    "daily": "Post a quote of the day in a channel at a set time",
+    "limits": "Show or change how often commands can be used in this server",
+}
+HELP_COMMANDS = [
+    (f"{PREFIX}authors", COMMAND_DESCRIPTIONS["authors"]),
+    (f"{PREFIX}persona <name>", f"{COMMAND_DESCRIPTIONS['persona']} (e.g., `{PREFIX}persona Marcus`)"),
+    (f"{PREFIX}bio", COMMAND_DESCRIPTIONS["bio"]),
+    (f"{PREFIX}quote [topic]", f"{COMMAND_DESCRIPTIONS['quote']}, optionally on a topic (e.g., `{PREFIX}quote anger`)"),
+    (f"{PREFIX}search <terms>", COMMAND_DESCRIPTIONS["search"]),
+    (f"{PREFIX}random", COMMAND_DESCRIPTIONS["random"]),
+    (f"{PREFIX}help", COMMAND_DESCRIPTIONS["help"]),
+    (f"{PREFIX}ping", COMMAND_DESCRIPTIONS["ping"]),
+    (f"{PREFIX}info", COMMAND_DESCRIPTIONS["info"]),
+    (f"{PREFIX}daily [#channel] <HH:MM> [timezone]", f"{COMMAND_DESCRIPTIONS['daily']} (e.g., `{PREFIX}daily 08:00 Europe/Rome`, or `{PREFIX}daily off`)"),
+    (f"{PREFIX}limits [command|guild] [n|default]", f"{COMMAND_DESCRIPTIONS['limits']} (e.g., `{PREFIX}limits quote 10`, or `{PREFIX}limits reset`)"),
+]
+
+
+def footer_text(additional_text: str = None) -> str:
+    """Build the consistent footer text with optional additional text."""
+    if additional_text:
+        return f"{additional_text} | {FOOTER_TEXT}"
+    return FOOTER_TEXT
+
+
+def set_embed_footer(embed: discord.Embed, additional_text: str = None) -> discord.Embed:
+    """Set consistent footer on all embeds with optional additional text."""
+    embed.set_footer(text=footer_text(additional_text))
+    return embed
+
+
+class RenderedEmbed(discord.Embed):
+    """An embed backed by a pre-rendered payload dict.
+
+    Sending only needs ``to_dict()``, so this skips rebuilding the embed's
+    fields on every call. Use ``copy()`` to get a regular, editable Embed.
+    """
+
+    __slots__ = ("_payload",)
+
+    def __init__(self, payload: dict):
+        self._payload = payload
+
+    def to_dict(self) -> dict:
+        return self._payload
+
+    def copy(self) -> discord.Embed:
+        return discord.Embed.from_dict(self._payload)
+
+
+# Rendered payloads keyed by (command, persona, corpus version) - cleared on corpus reload
+embed_cache: dict[tuple[str, str | None, int], dict] = {}
+
+
+def cached_payload(key: tuple[str, str | None, int], build) -> dict:
+    """Return the cached payload for `key`, rendering it with `build()` on a miss."""
+    payload = embed_cache.get(key)
+    if payload is None:
+        payload = embed_cache[key] = build().to_dict()
+    return payload
+
+
+def render_embed(key: tuple[str, str | None, int], build, footer: str = None, **patch) -> RenderedEmbed:
+    """Reuse a cached embed payload, patching only the per-call fields (e.g. the footer)."""
+    payload = cached_payload(key, build)
+    if footer is not None:
+        patch["footer"] = {"text": footer_text(footer)}
+    return RenderedEmbed({**payload, **patch} if patch else payload)
+
+
+def build_help_embed() -> discord.Embed:
+    """Build the static part of the !help embed."""
+    embed = discord.Embed(
+        title="🏛️ Stoic Quote Bot Commands",
+        description="Dispense wisdom from the great Stoic philosophers",
+        color=EMBED_COLOR
+    )
+    for cmd, desc in HELP_COMMANDS:
+        embed.add_field(name=cmd, value=desc, inline=False)
+    return embed
+
+
+def build_authors_embed(index: QuoteIndex) -> discord.Embed:
+    """Build the static part of the !authors embed for a given corpus.
+
+    Corpora can have any number of authors, so the list stops at Discord's
+    field and size limits and ends with a count of the authors left out.
+    """
+    embed = discord.Embed(
+        title="🏛️ Available Philosophers",
+        description=f"Choose a philosopher persona to receive their wisdom.\nUse `{PREFIX}persona <name>` to select one.",
+        color=EMBED_COLOR
+    )
+    total = len(index.sorted_ids)
+    max_fields = EMBED_MAX_FIELDS if total <= EMBED_MAX_FIELDS else EMBED_MAX_FIELDS - 1
+    for shown, author_id in enumerate(index.sorted_ids):
+        start, end = index.ranges[author_id]
+        name = truncate(f"📜 {index.authors[author_id]} ({end - start} quotes)", EMBED_MAX_FIELD_NAME)
+        value = f"*\"{index.samples[author_id]}\"*"
+        if shown == max_fields or len(embed) + len(name) + len(value) > AUTHORS_EMBED_BUDGET:
+            embed.add_field(
+                name=f"…and {total - shown} more",
+                value=f"Use `{PREFIX}persona <name>` to pick any of them.",
+                inline=False
+            )
+            break
+        embed.add_field(name=name, value=value, inline=False)
+    return embed
+
+
+def build_bio_embed(author: str) -> discord.Embed:
+    """Build the static part of the !bio embed (everything except the sample quote)."""
+    bio = AUTHOR_BIOS.get(author, {})
+    embed = discord.Embed(
+        title=f"{bio.get('emoji', '📜')} {author}",
+        description=f"**{bio.get('title', 'Stoic Philosopher')}**\n*{bio.get('years', 'Unknown')}*",
+        color=EMBED_COLOR
+    )
+    embed.add_field(
+        name="📖 Biography",
+        value=bio.get('description', 'No description available.'),
+        inline=False
+    )
+    set_embed_footer(embed, f"Use {PREFIX}persona to switch philosophers")
+    return embed
+
+
+def build_welcome_embed(philosopher: str) -> discord.Embed:
+    """Build the guild welcome embed; the title and greeting are patched per guild."""
+    embed = discord.Embed(color=EMBED_COLOR)
+
+    # Add all available commands in nicely formatted sections
+    embed.add_field(
+        name="📜 Philosopher Selection",
+        value=(
+            f"`{PREFIX}authors` — List all philosophers with sample quotes\n"
+            f"`{PREFIX}persona <name>` — Choose your philosopher guide (e.g., `{PREFIX}persona Marcus`)\n"
+            f"`{PREFIX}bio` — Learn about your selected philosopher's life and teachings"
+        ),
+        inline=False
+    )
+
+    embed.add_field(
+        name="💬 Quote Commands",
+        value=(
+            f"`{PREFIX}quote [topic]` — Get a random quote from your selected philosopher\n"
+            f"`{PREFIX}search <terms>` — Find quotes about a topic (e.g., `{PREFIX}search death`)\n"
+            f"`{PREFIX}random` — Get a random quote from any philosopher"
+        ),
+        inline=False
+    )
+
+    embed.add_field(
+        name="ℹ️ Information",
+        value=(
+            f"`{PREFIX}help` — Display all available commands\n"
+            f"`{PREFIX}ping` — Check bot latency\n"
+            f"`{PREFIX}info` — Bot statistics and information\n"
+            f"`{PREFIX}daily <HH:MM> [timezone]` — Post a quote of the day in this channel"
+        ),
+        inline=False
+    )
+
+    # Add available philosophers list
+    philosophers_list = " • ".join([f"{AUTHOR_BIOS.get(p, {}).get('emoji', '📜')} {p}" for p in AUTHOR_GREETINGS])
+    embed.add_field(
+        name="🎭 Available Philosophers",
+        value=philosophers_list,
+        inline=False
+    )
+
+    set_embed_footer(embed, f"Speaking as {philosopher} • Use {PREFIX}help for more details")
+    return embed
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EVENTS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@tasks.loop(minutes=5)
+async def rotate_activity():
+    """Rotate the bot's Rich Presence activity every 5 minutes."""
+    activity = random.choice(ACTIVITIES)
+    await bot.change_presence(activity=activity)
+
+
+async def flush_state_stores():
+    """Persist every store's pending writes, logging (not raising) failures."""
+    for name, store in state_stores.items():
+        try:
+            await store.flush()
+        except (OSError, sqlite3.Error, ConnectionError, RuntimeError) as e:
+            log.error("Failed to save state", extra={"store": name, "error": str(e)})
+
+
+@tasks.loop(seconds=STATE_FLUSH_SECONDS)
+async def flush_state():
+    """Persist pending persona selections and guild settings in batches."""
+    await flush_state_stores()
+
+
+def start_background_tasks():
+    """Start every background loop that isn't running yet (safe to call on each ready or resume)."""
+    if SHARED_CORPUS_READER:
+        if not watch_snapshot.is_running():
+            watch_snapshot.start()
+    elif not refresh_quotes.is_running():
+        refresh_quotes.start()
+
+    for loop in (rotate_activity, flush_state, daily_quotes):
+        if not loop.is_running():
+            loop.start()
+
+    if METRICS_PORT and not measure_loop_lag.is_running():
+        measure_loop_lag.start()
+
+
+def mark_ready(how: str):
+    """Record startup time the first time the gateway becomes usable."""
+    global ready_after
+    if ready_after is None:
+        ready_after = process_uptime()
+        log_startup(how, guilds=len(bot.guilds), shard_ids=getattr(bot, "shard_ids", None) or [bot.shard_id or 0])
+
+
+@bot.event
+async def on_ready():
+    """Called when the bot successfully connects to Discord."""
+    log.info("Connected to Discord", extra={"user": str(bot.user), "guilds": len(bot.guilds), "python": sys.version})
+
+    # on_ready fires again after every reconnect - the loops are only started once
+    start_background_tasks()
+
+    # Set initial activity (rotate_activity changes it every 5 minutes)
+    initial_activity = random.choice(ACTIVITIES)
+    await bot.change_presence(activity=initial_activity)
+    log.info("Activity set", extra={"activity": f"{initial_activity.type.name} {initial_activity.name}"})
+
+    log.info("Stoic Quote Bot is ready")
+    mark_ready("ready")
+
+
+@bot.event
+async def on_resumed():
+    """Called when a session resumes - after a reconnect, or at boot with a session saved by the last run.
+
+    A session resumed at boot gets no READY, so on_ready never fires for it. The
+    cache was restored before connecting; the session keeps its presence, and
+    the corpus snapshot is already loaded, so only the loops need starting.
+    """
+    if ready_after is not None:
+        return
+    log.info("Resumed gateway session from the previous run", extra={"user": str(bot.user), "guilds": len(bot.guilds)})
+    start_background_tasks()
+    if SLASH_COMMANDS:
+        # Registration is normally done on READY; this only writes if the commands changed
+        await bot.sync_commands()
+    mark_ready("resumed")
+
+
+# In-flight daily quote sends (kept referenced until they finish)
+daily_sends: set[asyncio.Task] = set()
+
+
+@tasks.loop(seconds=DAILY_TICK_SECONDS)
+async def daily_quotes():
+    """Send every daily quote that has come due and schedule each guild's next one."""
+    now = time.time()
+    for guild_id, subscription, fire_at in daily_schedule.pop_due(now):
+        if bot.get_guild(guild_id) is None:
+            # Briefly unavailable, or the bot was removed: keep it scheduled in case it comes back
+            daily_schedule.add(guild_id, subscription, max(fire_at, now))
+            continue
+        if now - fire_at <= DAILY_CATCHUP_HOURS * 3600:
+            task = asyncio.create_task(send_daily_quote(guild_id, subscription))
+            daily_sends.add(task)
+            task.add_done_callback(daily_sends.discard)
+        subscription = replace(subscription, last_fired=fire_at)
+        daily_store.set(guild_id, subscription)
+        daily_schedule.add(guild_id, subscription, max(fire_at, now))
+
+
+def schedule_subscription(guild_id: int, subscription: DailySubscription, now: float):
+    """Schedule a stored subscription; the latest firing it missed comes due immediately."""
+    if subscription.channel_id is None or load_timezone(subscription.timezone) is None:
+        return
+    # Only the most recent missed firing is worth sending (if still within the catch-up window)
+    missed = last_daily_fire(guild_id, subscription, now)
+    if missed > subscription.last_fired:
+        daily_schedule.add_at(guild_id, subscription, missed)
+    else:
+        daily_schedule.add(guild_id, subscription, now)
+
+
+@daily_quotes.before_loop
+async def load_daily_subscriptions():
+    """Schedule every stored subscription for a guild on this process's shards."""
+    subscriptions = await daily_store.items()
+    now = time.time()
+    for guild_id, subscription in subscriptions:
+        # Guilds served by another shard process are left to that process
+        if serves_guild(guild_id):
+            schedule_subscription(guild_id, subscription, now)
+    log.info("Scheduled daily quote subscriptions", extra={"subscriptions": len(daily_schedule)})
+
 
-# Bot activity statuses for Rich Presence (rotating)
-ACTIVITIES = [
-    discord.Activity(type=discord.ActivityType.watching, name="over your thoughts"),
-    discord.Activity(type=discord.ActivityType.listening, name="Seneca"),
-    discord.Activity(type=discord.ActivityType.playing, name="The Stoic Game"),
-    discord.Activity(type=discord.ActivityType.competing, name="Rome"),
-]
+async def send_daily_quote(guild_id: int, subscription: DailySubscription):
+    """Post one guild's quote of the day, in its default persona's voice."""
+    channel = bot.get_channel(subscription.channel_id)
+    if channel is None or not quote_index:
+        return
 
-# Footer configuration for embeds
-FOOTER_TEXT = "🚂 Powered by Stoic Wisdom • Railway Deployment"
+    settings = await get_guild_settings(guild_id)
+    author = settings.default_persona or DEFAULT_PERSONA
+    quote = quote_index.random_quote_by(author)
+    if quote is None:
+        author, quote = quote_index.random_quote()
 
-# Uniform embed color theme
-EMBED_COLOR = discord.Color.from_rgb(212, 175, 55)  # Gold/Bronze - Roman theme
+    embed = discord.Embed(
+        title="🌅 Quote of the Day",
+        description=f"*\"{quote}\"*",
+        color=EMBED_COLOR
+    )
+    embed.set_author(name=f"📜 {author}")
+    set_embed_footer(embed, f"Use {PREFIX}quote for more wisdom")
 
-# Philosopher biographies
-AUTHOR_BIOS = {
-    "Marcus Aurelius": {
-        "years": "121-180 AD",
-        "title": "Roman Emperor & Stoic Philosopher",
-        "description": "Roman Emperor and Stoic philosopher. His *Meditations* are private notes to himself on Stoic philosophy, written during military campaigns. He is considered the last of the Five Good Emperors.",
-        "emoji": "👑",
-    },
-    "Seneca": {
-        "years": "4 BC - 65 AD",
-        "title": "Stoic Philosopher & Statesman",
-        "description": "Roman Stoic philosopher, statesman, and dramatist. Advisor to Emperor Nero. Known for his letters on ethics and natural philosophy. His works on anger, tranquility, and the shortness of life remain influential.",
-        "emoji": "📝",
-    },
-    "Epictetus": {
-        "years": "50-135 AD",
-        "title": "Stoic Philosopher & Former Slave",
-        "description": "Born a slave, became one of the most influential Stoic philosophers. His teachings focus on what is *in our control* vs what is not. His philosophy emphasizes acceptance and inner freedom.",
-        "emoji": "⛓️",
-    },
-}
+    try:
+        await outbound.send(channel.id, channel.send, PRIORITY_BACKGROUND, embed=embed)
+    except discord.HTTPException as e:
+        log.warning("Daily quote failed", extra={"guild_id": guild_id, "error": str(e)})
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# BOT SETUP
-# ═══════════════════════════════════════════════════════════════════════════════
 
-intents = discord.Intents.default()
-intents.message_content = True
+def count_command_error(ctx, error: Exception):
+    """Count a command that was throttled, rejected before running, or failed while running."""
+    if ctx.command is None:
+        return
+    if isinstance(error, CommandThrottled):
+        reason = "throttled"
+    elif isinstance(error, (commands.CommandInvokeError, discord.ApplicationCommandInvokeError)):
+        reason = "failed"
+    else:
+        reason = "rejected"
+    command_errors_total.inc(ctx.command.qualified_name, reason)
 
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
 
-# Storage for quotes grouped by author
-quotes_by_author: dict[str, list[str]] = defaultdict(list)
+@bot.before_invoke
+async def start_command(ctx):
+    """Count the invocation and, with metrics on, record the end of its parse phase."""
+    commands_total.inc(ctx.command.qualified_name)
+    timing = command_timing.get()
+    if timing is not None:
+        timing.parsed = time.perf_counter()
+        command_phase_seconds.observe(timing.parsed - timing.received, ctx.command.qualified_name, "parse")
 
-# Storage for user personas (user_id -> author_name)
-user_personas: dict[int, str] = {}
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# QUOTE FETCHING
-# ═══════════════════════════════════════════════════════════════════════════════
+@tasks.loop(seconds=1)
+async def measure_loop_lag():
+    """Sample how long a task that yields waits to be resumed."""
+    started = time.perf_counter()
+    await asyncio.sleep(0)
+    event_loop_lag_seconds.observe(time.perf_counter() - started)
 
-async def fetch_quotes():
-    """Fetch 100 quotes from the Stoic Quotes API and group by author."""
-    global quotes_by_author
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(STOIC_API_URL) as response:
-            if response.status == 200:
-                quotes = await response.json()
-                
-                # Group quotes by author
-                for quote in quotes:
-                    author = quote.get("author", "Unknown")
-                    text = quote.get("text", "")
-                    if text:
-                        quotes_by_author[author].append(text)
-                
-                # Log the results
-                total = sum(len(q) for q in quotes_by_author.values())
-                print(f"📚 Loaded {total} quotes from {len(quotes_by_author)} authors:")
-                for author, author_quotes in quotes_by_author.items():
-                    print(f"   • {author}: {len(author_quotes)} quotes")
-            else:
-                print(f"❌ Failed to fetch quotes: HTTP {response.status}")
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# EVENTS
-# ═══════════════════════════════════════════════════════════════════════════════
+if METRICS_PORT:
+    # These replace py-cord's default handlers to timestamp each command as it arrives
+    @bot.event
+    async def on_message(message):
+        command_timing.set(CommandTiming(time.perf_counter()))
+        await bot.process_commands(message)
 
-def set_embed_footer(embed: discord.Embed, additional_text: str = None) -> discord.Embed:
-    """Set consistent footer on all embeds with optional additional text."""
-    if additional_text:
-        footer_text = f"{additional_text} | {FOOTER_TEXT}"
-    else:
-        footer_text = FOOTER_TEXT
-    embed.set_footer(text=footer_text)
-    return embed
+    @bot.event
+    async def on_interaction(interaction):
+        command_timing.set(CommandTiming(time.perf_counter()))
+        await bot.process_application_commands(interaction)
 
+    @bot.event
+    async def on_socket_event_type(event_type):
+        gateway_events_total.inc(event_type)
 
-@tasks.loop(minutes=5)
-async def rotate_activity():
-    """Rotate the bot's Rich Presence activity every 5 minutes."""
-    activity = random.choice(ACTIVITIES)
-    await bot.change_presence(activity=activity)
+
+def throttled_message(error: CommandThrottled) -> str:
+    return f"⏳ Slow down! Try `{PREFIX}{error.command}` again in {math.ceil(error.retry_after)}s."
 
 
 @bot.event
-async def on_ready():
-    """Called when the bot successfully connects to Discord."""
-    print(f"✅ {bot.user} is online!")
-    print(f"📊 Connected to {len(bot.guilds)} guild(s)")
-    print(f"🐍 Python version: {os.sys.version}")
-    print("📖 Fetching Stoic quotes...")
-    await fetch_quotes()
-    
-    # Set initial activity and start rotation
-    initial_activity = random.choice(ACTIVITIES)
-    await bot.change_presence(activity=initial_activity)
-    print(f"🎮 Activity set: {initial_activity.type.name} {initial_activity.name}")
-    
-    if not rotate_activity.is_running():
-        rotate_activity.start()
-    
-    print("🏛️ Stoic Quote Bot is ready!")
+async def on_command_error(ctx, error):
+    """Tell throttled users to slow down (once per window); report anything else."""
+    count_command_error(ctx, error)
+    if isinstance(error, CommandThrottled):
+        if error.first:
+            await reply(ctx, throttled_message(error))
+        return
+
+    log.error("Command failed", exc_info=error, extra={"command": str(ctx.command)})
+
+
+@bot.event
+async def on_application_command_error(ctx, error):
+    """Slash command counterpart of on_command_error.
+
+    Every interaction needs a response, so throttled ones always get an
+    ephemeral notice (interaction responses don't use channel rate limits),
+    and failed ones an ephemeral error instead of Discord's "did not respond".
+    """
+    count_command_error(ctx, error)
+    if isinstance(error, CommandThrottled):
+        await ctx.respond(throttled_message(error), ephemeral=True)
+        return
+
+    log.error("Command failed", exc_info=error, extra={"command": str(ctx.command)})
+    try:
+        await ctx.respond("❌ Something went wrong running this command.", ephemeral=True)
+    except discord.HTTPException as e:
+        log.warning("Could not report slash command failure", extra={"command": str(ctx.command), "error": str(e)})
 
 
 @bot.event
 async def on_guild_join(guild):
     """Called when the bot joins a new server. Greets with random persona and shows all commands."""
-    global DEFAULT_PERSONA
+    # A server that re-adds the bot gets its daily quotes back
+    subscription = await daily_store.get(guild.id)
+    if subscription is not None:
+        schedule_subscription(guild.id, subscription, time.time())
 
     # Find the first text channel we can send to
     target_channel = None
@@ -184,62 +3065,21 @@ async def on_guild_join(guild):
     if not target_channel:
         return
 
-    # Pick a random philosopher persona and set as default
+    # Pick a random philosopher persona and set as this guild's default
     philosophers = list(AUTHOR_GREETINGS.keys())
     chosen_philosopher = random.choice(philosophers)
-    DEFAULT_PERSONA = chosen_philosopher  # Set as new default for all users
+    settings = await get_guild_settings(guild.id)
+    guild_store.set(guild.id, replace(settings, default_persona=chosen_philosopher))
 
     greeting = random.choice(AUTHOR_GREETINGS[chosen_philosopher])
-    bio = AUTHOR_BIOS.get(chosen_philosopher, {})
-
-    # Create main welcome embed with greeting
-    embed = discord.Embed(
+    embed = render_embed(
+        ("welcome", chosen_philosopher, quote_index.version),
+        lambda: build_welcome_embed(chosen_philosopher),
         title=f"🏛️ Hail, {guild.name}!",
         description=greeting,
-        color=EMBED_COLOR
-    )
-
-    # Add all available commands in nicely formatted sections
-    embed.add_field(
-        name="📜 Philosopher Selection",
-        value=(
-            "`!authors` — List all philosophers with sample quotes\n"
-            "`!persona <name>` — Choose your philosopher guide (e.g., `!persona Marcus`)\n"
-            "`!bio` — Learn about your selected philosopher's life and teachings"
-        ),
-        inline=False
-    )
-
-    embed.add_field(
-        name="💬 Quote Commands",
-        value=(
-            "`!quote` — Get a random quote from your selected philosopher\n"
-            "`!random` — Get a random quote from any philosopher"
-        ),
-        inline=False
-    )
-
-    embed.add_field(
-        name="ℹ️ Information",
-        value=(
-            "`!help` — Display all available commands\n"
-            "`!ping` — Check bot latency\n"
-            "`!info` — Bot statistics and information"
-        ),
-        inline=False
     )
 
-    # Add available philosophers list
-    philosophers_list = " • ".join([f"{AUTHOR_BIOS.get(p, {}).get('emoji', '📜')} {p}" for p in philosophers])
-    embed.add_field(
-        name="🎭 Available Philosophers",
-        value=philosophers_list,
-        inline=False
-    )
-
-    set_embed_footer(embed, f"Speaking as {chosen_philosopher} • Use !help for more details")
-
-    await target_channel.send(embed=embed)
+    await outbound.send(target_channel.id, target_channel.send, PRIORITY_BACKGROUND, embed=embed)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # COMMANDS
@@ -248,60 +3088,50 @@ async def on_guild_join(guild):
 @bot.command(name="authors")
 async def list_authors(ctx):
     """List all available philosopher personas."""
-    if not quotes_by_author:
-        await ctx.send("⏳ Quotes are still loading. Please try again in a moment.")
+    if not quote_index:
+        await reply(ctx, "⏳ Quotes are still loading. Please try again in a moment.")
         return
     
-    embed = discord.Embed(
-        title="🏛️ Available Philosophers",
-        description="Choose a philosopher persona to receive their wisdom.\nUse `!persona <name>` to select one.",
-        color=EMBED_COLOR
-    )
-    
-    for author, quotes in sorted(quotes_by_author.items()):
-        # Get a sample quote for each author
-        sample = quotes[0][:100] + "..." if len(quotes[0]) > 100 else quotes[0]
-        embed.add_field(
-            name=f"📜 {author} ({len(quotes)} quotes)",
-            value=f"*\"{sample}\"*",
-            inline=False
-        )
-    
     # Show current persona
-    current = user_personas.get(ctx.author.id, DEFAULT_PERSONA)
-    set_embed_footer(embed, f"Your current persona: {current}")
+    current = await resolve_persona(ctx)
+    index = quote_index
+    embed = render_embed(
+        ("authors", None, index.version),
+        lambda: build_authors_embed(index),
+        footer=f"Your current persona: {truncate(current, 100)}",
+    )
     
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=embed)
 
 
 @bot.command(name="persona")
 async def set_persona(ctx, *, author_name: str = None):
     """Set your philosopher persona. Usage: !persona <author name>"""
-    if not quotes_by_author:
-        await ctx.send("⏳ Quotes are still loading. Please try again in a moment.")
+    if not quote_index:
+        await reply(ctx, "⏳ Quotes are still loading. Please try again in a moment.")
         return
     
     if not author_name:
-        current = user_personas.get(ctx.author.id, DEFAULT_PERSONA)
-        await ctx.send(f"Your current persona is **{current}**. Use `!persona <author name>` to change it.")
+        current = await resolve_persona(ctx)
+        await reply(ctx, f"Your current persona is **{current}**. Use `{PREFIX}persona <author name>` to change it.")
         return
     
-    # Find matching author (case-insensitive partial match)
-    matching_author = None
-    author_lower = author_name.lower()
-    
-    for author in quotes_by_author.keys():
-        if author_lower in author.lower() or author.lower() in author_lower:
-            matching_author = author
-            break
+    # Find matching author (alias, prefix, then typo-tolerant match)
+    resolver = quote_index.resolver
+    matching_author = resolver.resolve(author_name)
     
     if not matching_author:
-        available = ", ".join(quotes_by_author.keys())
-        await ctx.send(f"❌ Philosopher not found: **{author_name}**\nAvailable: {available}")
+        message = f"❌ Philosopher not found: **{author_name}**"
+        suggestions = resolver.suggest(author_name)
+        if suggestions:
+            message += f"\nDid you mean: {', '.join(f'**{s}**' for s in suggestions)}?"
+        if len(quote_index.authors) <= 10:
+            message += f"\nAvailable: {', '.join(quote_index.authors)}"
+        await reply(ctx, message)
         return
     
     # Set the persona
-    user_personas[ctx.author.id] = matching_author
+    persona_store.set(ctx.author.id, matching_author)
     
     # Get a greeting in the philosopher's style
     greetings = AUTHOR_GREETINGS.get(matching_author, [f"Hello, I am **{matching_author}**."])
@@ -312,144 +3142,161 @@ async def set_persona(ctx, *, author_name: str = None):
         description=greeting,
         color=EMBED_COLOR
     )
-    set_embed_footer(embed, f"Use !quote to receive wisdom from {matching_author}")
+    set_embed_footer(embed, f"Use {PREFIX}quote to receive wisdom from {matching_author}")
     
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=embed)
 
 
 @bot.command(name="quote")
-async def get_quote(ctx):
-    """Get a random quote from your selected philosopher."""
-    if not quotes_by_author:
-        await ctx.send("⏳ Quotes are still loading. Please try again in a moment.")
+async def get_quote(ctx, *, topic: str = None):
+    """Get a random quote from your selected philosopher. Usage: !quote [topic]"""
+    if not quote_index:
+        await reply(ctx, "⏳ Quotes are still loading. Please try again in a moment.")
         return
     
     # Get user's current persona
-    current_author = user_personas.get(ctx.author.id, DEFAULT_PERSONA)
+    current_author = await resolve_persona(ctx)
     
-    # Get quotes for this author
-    author_quotes = quotes_by_author.get(current_author, [])
+    # Select a matching, the next unseen, or a random quote for this author
+    if topic:
+        index = quote_index
+        await index.search.ready()
+        matches = index.search_quotes(topic, SEARCH_TOPIC_POOL, current_author)
+        if not matches:
+            await reply(
+                ctx,
+                f"🔍 No quotes from {current_author} about **{truncate(topic, 100)}**. "
+                f"Try `{PREFIX}search {truncate(topic, 100)}` to search every philosopher."
+            )
+            return
+        quote = index.quotes[random.choice(matches)]
+    elif NO_REPEAT_QUOTES:
+        quote = await next_unseen_quote(ctx.author.id, current_author)
+    else:
+        quote = quote_index.random_quote_by(current_author)
     
-    if not author_quotes:
-        await ctx.send(f"❌ No quotes available for {current_author}.")
+    if quote is None:
+        await reply(ctx, f"❌ No quotes available for {current_author}.")
         return
     
-    # Select a random quote
-    quote = random.choice(author_quotes)
-    
     # Create a beautiful embed
     embed = discord.Embed(
         description=f"*\"{quote}\"*",
         color=EMBED_COLOR
     )
     embed.set_author(name=f"📜 {current_author}")
-    set_embed_footer(embed, "Use !quote for another, or !persona to change philosopher")
+    set_embed_footer(embed, f"Use {PREFIX}quote for another, or {PREFIX}persona to change philosopher")
+    
+    await reply(ctx, embed=embed)
+
+
+@bot.command(name="search")
+async def search_command(ctx, *, terms: str = None):
+    """Find quotes about a topic. Usage: !search <terms>"""
+    if not quote_index:
+        await reply(ctx, "⏳ Quotes are still loading. Please try again in a moment.")
+        return
+    
+    if not terms:
+        await reply(ctx, f"🔍 Usage: `{PREFIX}search <terms>` (e.g., `{PREFIX}search anger`)")
+        return
+    
+    index = quote_index
+    await index.search.ready()
+    matches = index.search_quotes(terms, SEARCH_RESULTS)
+    if not matches:
+        await reply(ctx, f"🔍 No quotes found about **{truncate(terms, 100)}**.")
+        return
+    
+    embed = discord.Embed(
+        title=f"🔍 Quotes about \"{truncate(terms, 100)}\"",
+        color=EMBED_COLOR
+    )
+    for position in matches:
+        embed.add_field(
+            name=f"📜 {index.authors[index.quote_authors[position]]}",
+            value=f"*\"{truncate(index.quotes[position], 1000)}\"*",
+            inline=False
+        )
+    set_embed_footer(embed, f"Use {PREFIX}quote <topic> for one from your philosopher")
     
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=embed)
 
 
 @bot.command(name="random")
 async def random_quote(ctx):
     """Get a random quote from any philosopher."""
-    if not quotes_by_author:
-        await ctx.send("⏳ Quotes are still loading. Please try again in a moment.")
+    if not quote_index:
+        await reply(ctx, "⏳ Quotes are still loading. Please try again in a moment.")
         return
     
-    # Select a random author and quote
-    author = random.choice(list(quotes_by_author.keys()))
-    quote = random.choice(quotes_by_author[author])
+    # Select a quote uniformly over the whole corpus
+    author, quote = quote_index.random_quote()
     
     embed = discord.Embed(
         description=f"*\"{quote}\"*",
         color=EMBED_COLOR
     )
     embed.set_author(name=f"📜 {author}")
-    set_embed_footer(embed, "Use !persona to follow this philosopher")
+    set_embed_footer(embed, f"Use {PREFIX}persona to follow this philosopher")
     
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=embed)
 
 
 @bot.command(name="help")
 async def help_command(ctx):
     """Display available bot commands."""
-    embed = discord.Embed(
-        title="🏛️ Stoic Quote Bot Commands",
-        description="Dispense wisdom from the great Stoic philosophers",
-        color=EMBED_COLOR
-    )
-    
-    commands_list = [
-        ("!authors", "List all available philosophers and their quote counts"),
-        ("!persona <name>", "Select a philosopher persona (e.g., `!persona Marcus`)"),
-        ("!bio", "Learn about your selected philosopher's life and teachings"),
-        ("!quote", "Get a random quote from your selected philosopher"),
-        ("!random", "Get a random quote from any philosopher"),
-        ("!help", "Show this help message"),
-        ("!ping", "Check bot latency"),
-        ("!info", "Display bot information"),
-    ]
-    
-    for cmd, desc in commands_list:
-        embed.add_field(name=cmd, value=desc, inline=False)
-    
     # Show current persona
-    current = user_personas.get(ctx.author.id, DEFAULT_PERSONA)
-    set_embed_footer(embed, f"Your current persona: {current}")
+    current = await resolve_persona(ctx)
+    embed = render_embed(
+        ("help", None, quote_index.version),
+        build_help_embed,
+        footer=f"Your current persona: {current}",
+    )
     
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=embed)
 
 
 @bot.command(name="bio")
 async def bio_command(ctx):
     """Display biography of your selected philosopher."""
     # Get user's current persona
-    current_author = user_personas.get(ctx.author.id, DEFAULT_PERSONA)
+    current_author = await resolve_persona(ctx)
     bio = AUTHOR_BIOS.get(current_author, {})
     
     if not bio:
-        await ctx.send(f"❌ No biography available for {current_author}.")
+        await reply(ctx, f"❌ No biography available for {current_author}.")
         return
     
-    embed = discord.Embed(
-        title=f"{bio.get('emoji', '📜')} {current_author}",
-        description=f"**{bio.get('title', 'Stoic Philosopher')}**\n*{bio.get('years', 'Unknown')}*",
-        color=EMBED_COLOR
-    )
-    
-    embed.add_field(
-        name="📖 Biography",
-        value=bio.get('description', 'No description available.'),
-        inline=False
-    )
+    payload = cached_payload(("bio", current_author, quote_index.version), lambda: build_bio_embed(current_author))
     
     # Add a sample quote if available
-    author_quotes = quotes_by_author.get(current_author, [])
-    if author_quotes:
-        sample_quote = random.choice(author_quotes)
-        if len(sample_quote) > 200:
-            sample_quote = sample_quote[:197] + "..."
-        embed.add_field(
-            name="💬 Sample Wisdom",
-            value=f"*\"{sample_quote}\"*",
-            inline=False
-        )
+    sample_quote = quote_index.random_quote_by(current_author)
+    if sample_quote is not None:
+        sample_field = {
+            "name": "💬 Sample Wisdom",
+            "value": f"*\"{truncate(sample_quote, BIO_SAMPLE_LENGTH)}\"*",
+            "inline": False,
+        }
+        payload = {**payload, "fields": [*payload["fields"], sample_field]}
     
-    set_embed_footer(embed, "Use !persona to switch philosophers")
-    
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=RenderedEmbed(payload))
 
 
 @bot.command(name="ping")
 async def ping(ctx):
     """Simple ping command to test if bot is responsive."""
-    latency = round(bot.latency * 1000)
+    shard_id, latency = shard_latency(ctx.guild)
+    description = f"Latency: **{format_latency(latency)}**"
+    if shard_id is not None:
+        description += f"\nShard: **#{shard_id}**"
     embed = discord.Embed(
         title="🏓 Pong!",
-        description=f"Latency: **{latency}ms**",
+        description=description,
         color=EMBED_COLOR
     )
     set_embed_footer(embed)
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=embed)
 
 
 @bot.command(name="info")
@@ -465,29 +3312,420 @@ async def info(ctx):
     embed.add_field(name="Guilds", value=str(len(bot.guilds)), inline=True)
     
     # Quote stats
-    total_quotes = sum(len(q) for q in quotes_by_author.values())
-    embed.add_field(name="Total Quotes", value=str(total_quotes), inline=True)
-    embed.add_field(name="Philosophers", value=str(len(quotes_by_author)), inline=True)
+    embed.add_field(name="Total Quotes", value=str(quote_index.total), inline=True)
+    embed.add_field(name="Philosophers", value=str(len(quote_index.authors)), inline=True)
+    embed.add_field(name="Memory", value=f"{process_memory()[0] / 2**20:.0f} MB", inline=True)
+    embed.add_field(name="Shard Latency", value=format_shard_latencies(), inline=False)
     set_embed_footer(embed)
     
-    await ctx.send(embed=embed)
+    await reply(ctx, embed=embed)
+
+
+@bot.command(name="daily")
+async def daily_command(ctx, channel: discord.TextChannel | None = None, at: str = None,
+                        timezone: str = DEFAULT_TIMEZONE):
+    """Schedule a daily quote. Usage: !daily [#channel] <HH:MM> [timezone], or !daily off"""
+    if ctx.guild is None:
+        await reply(ctx, "❌ Daily quotes can only be set up in a server.")
+        return
+
+    subscription = await daily_store.get(ctx.guild.id)
+    active = subscription is not None and subscription.channel_id is not None
+
+    if at is None:
+        if active:
+            await reply(
+                ctx,
+                f"🌅 A quote of the day is posted in <#{subscription.channel_id}> "
+                f"at **{subscription.time}** ({subscription.timezone}). Use `{PREFIX}daily off` to stop it."
+            )
+        else:
+            await reply(ctx, f"🌅 Usage: `{PREFIX}daily [#channel] <HH:MM> [timezone]` (e.g., `{PREFIX}daily 08:00 Europe/Rome`)")
+        return
+
+    if not ctx.author.guild_permissions.manage_guild:
+        await reply(ctx, "❌ You need the **Manage Server** permission to change daily quotes.")
+        return
+
+    if at.lower() == "off":
+        if active:
+            daily_store.set(ctx.guild.id, replace(subscription, channel_id=None))
+            daily_schedule.remove(ctx.guild.id)
+        await reply(ctx, "🌅 Daily quotes are off for this server.")
+        return
+
+    parsed = parse_daily_time(at)
+    if parsed is None:
+        await reply(ctx, f"❌ `{truncate(at, 20)}` isn't a valid time. Use 24-hour `HH:MM`, e.g. `08:00`.")
+        return
+    if load_timezone(timezone) is None:
+        await reply(ctx, f"❌ Unknown timezone `{truncate(timezone, 50)}`. Use a name like `Europe/Rome` or `America/New_York`.")
+        return
+
+    target = channel or ctx.channel
+    subscription = DailySubscription(target.id, f"{parsed[0]:02d}:{parsed[1]:02d}", timezone, time.time())
+    daily_store.set(ctx.guild.id, subscription)
+    daily_schedule.add(ctx.guild.id, subscription, subscription.last_fired)
+    await reply(ctx, f"🌅 A quote of the day will be posted in <#{target.id}> at **{subscription.time}** ({timezone}).")
+
+
+def format_command_limits(settings: GuildSettings) -> str:
+    """List each command's per-user limit and the guild-wide limit, marking server overrides."""
+    overrides = settings.command_limits or {}
+    lines = []
+    for name in sorted(USER_COMMAND_LIMITS):
+        limit = overrides.get(name, USER_COMMAND_LIMITS[name])
+        lines.append(f"`{PREFIX}{name}` {limit} per user" + (" *(server)*" if name in overrides else ""))
+    guild_limit = settings.guild_command_limit
+    lines.append(f"Whole server: {GUILD_COMMAND_LIMIT if guild_limit is None else guild_limit} per command"
+                 + (" *(server)*" if guild_limit is not None else ""))
+    return "\n".join(lines)
+
+
+@bot.command(name="limits")
+async def limits_command(ctx, command: str = None, limit: str = None):
+    """Show or change this server's command limits. Usage: !limits [command|guild] [n|default], or !limits reset"""
+    if ctx.guild is None:
+        await reply(ctx, "❌ Command limits can only be set in a server.")
+        return
+
+    settings = await get_guild_settings(ctx.guild.id)
+    if command is None:
+        await reply(ctx, f"⏱️ Commands allowed per {THROTTLE_WINDOW_SECONDS:g}s in this server:\n{format_command_limits(settings)}")
+        return
+
+    if not ctx.author.guild_permissions.manage_guild and not await bot.is_owner(ctx.author):
+        await reply(ctx, "❌ You need the **Manage Server** permission to change command limits.")
+        return
+
+    command = command.lower().removeprefix(PREFIX)
+    if command == "reset":
+        guild_store.set(ctx.guild.id, replace(settings, command_limits=None, guild_command_limit=None))
+        await reply(ctx, "⏱️ Command limits are back to the defaults for this server.")
+        return
+    if command != "guild" and command not in USER_COMMAND_LIMITS:
+        await reply(ctx, f"❌ Unknown command `{truncate(command, 20)}`. Use a command name or `guild`.")
+        return
+    if limit is None:
+        await reply(ctx, f"⏱️ Usage: `{PREFIX}limits {command} <1-{MAX_COMMAND_LIMIT}>` or `{PREFIX}limits {command} default`")
+        return
 
+    if limit.lower() == "default":
+        value = None
+    elif limit.isdigit() and 1 <= int(limit) <= MAX_COMMAND_LIMIT:
+        value = int(limit)
+    else:
+        await reply(ctx, f"❌ The limit must be a number from 1 to {MAX_COMMAND_LIMIT}, or `default`.")
+        return
+
+    if command == "guild":
+        settings = replace(settings, guild_command_limit=value)
+    else:
+        overrides = dict(settings.command_limits or {})
+        if value is None:
+            overrides.pop(command, None)
+        else:
+            overrides[command] = value
+        settings = replace(settings, command_limits=overrides or None)
+    guild_store.set(ctx.guild.id, settings)
+    await reply(ctx, f"⏱️ Updated. Commands allowed per {THROTTLE_WINDOW_SECONDS:g}s in this server:\n{format_command_limits(settings)}")
+
+
+@bot.command(name="reload")
+async def reload_command(ctx):
+    """Rebuild the quote corpus and indexes without a restart (bot owner only)."""
+    if not await bot.is_owner(ctx.author):
+        await reply(ctx, "❌ Only the bot owner can reload quotes.")
+        return
+    if corpus_lock.locked():
+        await reply(ctx, "⏳ A quote reload is already running.")
+        return
+
+    await reply(ctx, "🔄 Reloading quotes in the background...")
+    try:
+        changed = await reload_corpus(f"command by {ctx.author.id}")
+    except QUOTE_FETCH_ERRORS as e:
+        await reply(ctx, f"❌ Reload failed: {truncate(str(e), 200)}. The current quotes are still in use.")
+        return
+    if changed:
+        await reply(ctx, f"✅ Reloaded **{quote_index.total}** quotes from **{len(quote_index.authors)}** philosophers.")
+    else:
+        await reply(ctx, f"✅ Quotes are already up to date (**{quote_index.total}** quotes).")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SLASH COMMANDS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+async def run_slash(ctx: discord.ApplicationContext, command: commands.Command, **kwargs):
+    """Run a prefix command's handler for a slash command, deferring if it runs long."""
+    interaction_id = ctx.interaction.id
+
+    def deferred(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("Could not defer slash command",
+                        extra={"command": command.qualified_name, "error": str(task.exception())})
+
+    def defer():
+        if interaction_id in answering_interactions or ctx.interaction.response.is_done():
+            return
+        task = asyncio.ensure_future(ctx.defer())
+        task.add_done_callback(deferred)
+        pending_defers[interaction_id] = task
+
+    timer = asyncio.get_running_loop().call_later(SLASH_DEFER_AFTER, defer)
+    try:
+        await command.callback(ctx, **kwargs)
+    finally:
+        timer.cancel()
+        # Let a deferral in flight settle so error handlers see the final response state
+        deferring = pending_defers.pop(interaction_id, None)
+        if deferring is not None:
+            await asyncio.wait([deferring])
+
+
+def persona_choices(ctx: discord.AutocompleteContext) -> tuple[str, ...]:
+    """Autocomplete values for the persona option."""
+    return quote_index.authors
+
+
+if SLASH_COMMANDS:
+    @bot.slash_command(name="authors", description=COMMAND_DESCRIPTIONS["authors"])
+    async def slash_authors(ctx: discord.ApplicationContext):
+        await run_slash(ctx, list_authors)
+
+    @bot.slash_command(name="persona", description=COMMAND_DESCRIPTIONS["persona"])
+    async def slash_persona(
+        ctx: discord.ApplicationContext,
+        name: discord.Option(
+            str, "Philosopher to follow (leave empty to see your current one)",
+            required=False, default=None, autocomplete=discord.utils.basic_autocomplete(persona_choices),
+        ),
+    ):
+        await run_slash(ctx, set_persona, author_name=name)
+
+    @bot.slash_command(name="quote", description=COMMAND_DESCRIPTIONS["quote"])
+    async def slash_quote(
+        ctx: discord.ApplicationContext,
+        topic: discord.Option(str, "Only quotes about this topic", required=False, default=None),
+    ):
+        await run_slash(ctx, get_quote, topic=topic)
+
+    @bot.slash_command(name="search", description=COMMAND_DESCRIPTIONS["search"])
+    async def slash_search(
+        ctx: discord.ApplicationContext,
+        terms: discord.Option(str, "Words to search for (e.g., anger, death)"),
+    ):
+        await run_slash(ctx, search_command, terms=terms)
+
+    @bot.slash_command(name="random", description=COMMAND_DESCRIPTIONS["random"])
+    async def slash_random(ctx: discord.ApplicationContext):
+        await run_slash(ctx, random_quote)
+
+    @bot.slash_command(name="help", description=COMMAND_DESCRIPTIONS["help"])
+    async def slash_help(ctx: discord.ApplicationContext):
+        await run_slash(ctx, help_command)
+
+    @bot.slash_command(name="bio", description=COMMAND_DESCRIPTIONS["bio"])
+    async def slash_bio(ctx: discord.ApplicationContext):
+        await run_slash(ctx, bio_command)
+
+    @bot.slash_command(name="ping", description=COMMAND_DESCRIPTIONS["ping"])
+    async def slash_ping(ctx: discord.ApplicationContext):
+        await run_slash(ctx, ping)
+
+    @bot.slash_command(name="info", description=COMMAND_DESCRIPTIONS["info"])
+    async def slash_info(ctx: discord.ApplicationContext):
+        await run_slash(ctx, info)
+
+    @bot.slash_command(
+        name="daily", description=COMMAND_DESCRIPTIONS["daily"],
+        default_member_permissions=discord.Permissions(manage_guild=True),
+    )
+    async def slash_daily(
+        ctx: discord.ApplicationContext,
+        at: discord.Option(str, "Local time as HH:MM, or \"off\" to stop (leave empty to see the current setting)",
+                           required=False, default=None),
+        timezone: discord.Option(str, "IANA timezone, e.g. Europe/Rome", required=False, default=DEFAULT_TIMEZONE),
+        channel: discord.Option(discord.TextChannel, "Channel to post in (defaults to this one)",
+                                required=False, default=None),
+    ):
+        await run_slash(ctx, daily_command, channel=channel, at=at, timezone=timezone)
+
+    @bot.slash_command(
+        name="limits", description=COMMAND_DESCRIPTIONS["limits"],
+        default_member_permissions=discord.Permissions(manage_guild=True),
+    )
+    async def slash_limits(
+        ctx: discord.ApplicationContext,
+        command: discord.Option(str, "Command to change, \"guild\" for the whole-server limit, or \"reset\"",
+                                required=False, default=None, choices=[*sorted(USER_COMMAND_LIMITS), "guild", "reset"]),
+        limit: discord.Option(str, "Uses allowed per window, or \"default\"", required=False, default=None),
+    ):
+        await run_slash(ctx, limits_command, command=command, limit=limit)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # MAIN ENTRY POINT
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Set once a shutdown has begun, so a second signal doesn't start another
+shutting_down = False
+
+# Tasks started from signal handlers (kept referenced until they finish)
+signal_tasks: set[asyncio.Task] = set()
+
+
+async def shutdown(reason: str):
+    """Stop background work, send what's already queued, save state, then close the gateway."""
+    global shutting_down
+    if shutting_down:
+        return
+    shutting_down = True
+    log.info("Shutting down", extra={"reason": reason})
+
+    for loop in (refresh_quotes, watch_snapshot, rotate_activity, daily_quotes, measure_loop_lag):
+        loop.cancel()
+    # Let an in-progress flush finish rather than cutting a batch write in half
+    flush_state.stop()
+
+    dropped = await outbound.drain(SHUTDOWN_DRAIN_SECONDS)
+    if dropped:
+        log.warning("Dropped queued messages at shutdown", extra={"messages": dropped})
+    await flush_state_stores()
+
+    if not GATEWAY_SESSION_PATH:
+        await bot.close()
+        return
+    for ws in gateway_websockets().values():
+        if ws is not None:
+            keep_resumable(ws)
+    await bot.close()
+    # Captured after closing, so events this run never handled are replayed to the next one
+    state = capture_gateway_state()
+    if state is not None:
+        try:
+            await asyncio.to_thread(save_gateway_state, GATEWAY_SESSION_PATH, state)
+        except OSError as e:
+            log.error("Failed to save gateway sessions", extra={"path": GATEWAY_SESSION_PATH, "error": str(e)})
+        else:
+            log.info("Saved gateway sessions", extra={"shards": len(state["sessions"]), "guilds": len(state["guilds"])})
+
+
+async def reload_on_signal():
+    """SIGHUP handler: reload the corpus, logging failures instead of raising them."""
+    try:
+        await reload_corpus("SIGHUP")
+    except QUOTE_FETCH_ERRORS as e:
+        log.error("Failed to reload quotes", extra={"error": str(e)})
+
+
+def install_signal_handlers():
+    """Shut down cleanly on SIGTERM/SIGINT and reload the corpus on SIGHUP."""
+    loop = asyncio.get_running_loop()
+
+    def spawn(coro_fn, *args):
+        def handler():
+            task = asyncio.create_task(coro_fn(*args))
+            signal_tasks.add(task)
+            task.add_done_callback(signal_tasks.discard)
+        return handler
+
+    handlers = {signal.SIGTERM: spawn(shutdown, "SIGTERM"), signal.SIGINT: spawn(shutdown, "SIGINT")}
+    if hasattr(signal, "SIGHUP"):
+        handlers[signal.SIGHUP] = spawn(reload_on_signal)
+    for signum, handler in handlers.items():
+        try:
+            loop.add_signal_handler(signum, handler)
+        except NotImplementedError:
+            # e.g. Windows: keep Python's default handling
+            pass
+
+
+async def run_bot(token: str):
+    """Run the bot until it disconnects or is shut down, then flush state that lives in memory."""
+    install_signal_handlers()
+    metrics_runner = None
+    try:
+        if METRICS_PORT:
+            metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT + SHARD_WORKER)
+        async with bot:
+            await bot.start(token)
+    finally:
+        # Let a signal-triggered shutdown finish saving before the loop goes away
+        await asyncio.gather(*signal_tasks, return_exceptions=True)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        for store in state_stores.values():
+            await store.close()
+        if http_session is not None:
+            await http_session.close()
+
+
+async def fetch_recommended_shards(token: str) -> int:
+    """Ask Discord how many shards this bot should run."""
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(DISCORD_GATEWAY_BOT_URL, headers=headers) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+
+def run_shard_supervisor(token: str):
+    """Spawn worker processes that each run a contiguous range of shards, and wait for them."""
+    shard_count = SHARD_COUNT or asyncio.run(fetch_recommended_shards(token))
+    processes = max(1, min(SHARD_PROCESSES, shard_count))
+    per_worker, extra = divmod(shard_count, processes)
+
+    workers = []
+    start = 0
+    for worker in range(processes):
+        end = start + per_worker + (1 if worker < extra else 0)
+        env = {
+            **os.environ,
+            "SHARD_MODE": "multiprocess",
+            "SHARD_COUNT": str(shard_count),
+            "SHARD_IDS": ",".join(str(i) for i in range(start, end)),
+            "SHARD_WORKER": str(worker),
+        }
+        log.info("Starting shard worker", extra={"worker": worker, "shards": f"{start}-{end - 1}", "shard_count": shard_count})
+        workers.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
+        start = end
+
+    def forward(signum, frame):
+        for process in workers:
+            process.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, forward)
+    for process in workers:
+        process.wait()
+
+
 def main():
     """Main entry point for the bot."""
+    configure_logging()
     token = os.environ.get("DISCORD_TOKEN")
     
     if not token:
-        print("❌ ERROR: DISCORD_TOKEN environment variable not set!")
-        print("Please set the DISCORD_TOKEN variable in Railway dashboard.")
+        log.error("DISCORD_TOKEN environment variable not set; set it in the Railway dashboard")
         return
     
-    print("🚀 Starting Stoic Quote Bot...")
-    bot.run(token)
+    if SHARD_MODE == "multiprocess" and SHARD_IDS is None:
+        log.info("Starting Stoic Quote Bot shard supervisor")
+        run_shard_supervisor(token)
+        return
+
+    log.info("Starting Stoic Quote Bot")
+    log_startup("imported")
+    if SHARED_CORPUS_READER:
+        load_shared_snapshot()
+    else:
+        load_snapshot()
+    log_startup("corpus loaded", quotes=quote_index.total)
+    if GATEWAY_SESSION_PATH:
+        restore_gateway_state(GATEWAY_SESSION_PATH)
+    asyncio.run(run_bot(token))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# main.py reads its configuration at import time: keep state and snapshots out of the repo
+_data = tempfile.mkdtemp(prefix="stoicbot-test-")
+os.environ.setdefault("STATE_STORE_URL", f"sqlite:///{_data}/state.db")
+os.environ.setdefault("QUOTE_SNAPSHOT_PATH", f"{_data}/quotes.snapshot")
+os.environ.setdefault("GATEWAY_SESSION_PATH", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+import main
+
+AUTHOR = "Seneca"
+
+
+def quotes(n: int, prefix: str = "quote") -> list[str]:
+    return [f"{prefix} {i}" for i in range(n)]
+
+
+def draw(cursor, corpus, times):
+    positions = []
+    for _ in range(times):
+        position, cursor = main.advance_cursor(cursor, AUTHOR, len(corpus), corpus.__getitem__)
+        positions.append(position)
+    return positions, cursor
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 7, 17, 100, 1000, 4099])
+def test_permute_is_a_bijection(n):
+    for seed in (0, 1, 0xDEADBEEF):
+        assert sorted(main.permute(i, n, seed) for i in range(n)) == list(range(n))
+
+
+def test_cursor_round_trips():
+    fields = (0xFFFFFFFF, 70000, 69999, 0xFFFF)
+    assert main.unpack_cursor(main.pack_cursor(*fields)) == fields
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 50])
+def test_cycle_covers_every_quote_once(n):
+    corpus = quotes(n)
+    positions, _ = draw(None, corpus, n)
+    assert sorted(positions) == list(range(n))
+
+
+def test_next_cycle_does_not_repeat_the_last_quote():
+    random.seed(1)
+    for n in (2, 3, 5):
+        corpus = quotes(n)
+        cursor = None
+        for _ in range(200):
+            positions, cursor = draw(cursor, corpus, n + 1)
+            assert positions[n] != positions[n - 1]
+            positions, cursor = draw(cursor, corpus, n - 1)  # finish the cycle begun above
+
+
+def test_appended_quotes_keep_the_cycle():
+    corpus = quotes(10)
+    first, cursor = draw(None, corpus, 4)
+    corpus += quotes(5, "new")
+    rest, cursor = draw(cursor, corpus, 6)
+    assert sorted(first + rest) == list(range(10))
+    # The following cycle includes the new quotes
+    following, _ = draw(cursor, corpus, 15)
+    assert sorted(following) == list(range(15))
+
+
+def test_reordered_corpus_starts_a_new_cycle():
+    corpus = quotes(10)
+    _, cursor = draw(None, corpus, 4)
+    seed, length, offset, tag = main.unpack_cursor(cursor)
+    assert offset == 4 and tag == main.cycle_tag(AUTHOR, corpus[-1])
+
+    reloaded = list(reversed(corpus))
+    _, cursor = draw(cursor, reloaded, 1)
+    assert main.unpack_cursor(cursor)[2:] == (1, main.cycle_tag(AUTHOR, reloaded[-1]))
+
+
+def test_old_layout_cursor_starts_a_new_cycle():
+    # Before lengths and offsets were widened: 32-bit seed, then 16-bit length, offset and tag
+    corpus = quotes(10)
+    old = (((0x5EED5EED << 16 | 10) << 16 | 4) << 16) | main.cycle_tag(AUTHOR, corpus[-1])
+    _, cursor = draw(old, corpus, 1)
+    seed, length, offset, _ = main.unpack_cursor(cursor)
+    assert (length, offset) == (10, 1)
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import main
+
+ROME = ZoneInfo("Europe/Rome")
+GUILD_ID = 120  # fires at a 0-second offset into its minute (120 % DAILY_SPREAD_SECONDS)
+
+
+def at(year, month, day, hour=0, minute=0, tz=ROME) -> float:
+    return datetime(year, month, day, hour, minute, tzinfo=tz).timestamp()
+
+
+def local(timestamp: float, tz=ROME) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz)
+
+
+def rome(time: str, last_fired: float = 0.0) -> main.DailySubscription:
+    return main.DailySubscription(channel_id=1, time=time, timezone="Europe/Rome", last_fired=last_fired)
+
+
+def test_fires_spread_guilds_within_the_minute():
+    subscription = main.DailySubscription(1, "08:00")
+    fire = main.next_daily_fire(125, subscription, at(2026, 10, 13, tz=ZoneInfo("UTC")))
+    assert fire == at(2026, 10, 13, 8, tz=ZoneInfo("UTC")) + 125 % main.DAILY_SPREAD_SECONDS
+
+
+def test_fires_keep_local_time_across_dst():
+    # Rome moves to summer time on 2026-03-29 and back on 2026-10-25
+    fires = [main.next_daily_fire(GUILD_ID, rome("08:00"), after) for after in
+             (at(2026, 3, 28, 9), at(2026, 10, 24, 9))]
+    assert [local(fire).strftime("%m-%d %H:%M") for fire in fires] == ["03-29 08:00", "10-25 08:00"]
+    assert fires[0] - at(2026, 3, 28, 8) == 23 * 3600
+    assert fires[1] - at(2026, 10, 24, 8) == 25 * 3600
+
+
+def test_time_skipped_by_dst_fires_once_that_day():
+    # 02:30 doesn't exist in Rome on 2026-03-29; it fires once, an hour later on the wall clock
+    fires = main.daily_fires(GUILD_ID, rome("02:30"), at(2026, 3, 28, 12), 1)
+    days = [next(fires) for _ in range(3)]
+    assert [local(fire).strftime("%m-%d %H:%M") for fire in days] == ["03-28 02:30", "03-29 03:30", "03-30 02:30"]
+
+
+def test_repeated_time_fires_once_on_fall_back():
+    after = at(2026, 10, 24, 12)
+    first = main.next_daily_fire(GUILD_ID, rome("02:30"), after)
+    second = main.next_daily_fire(GUILD_ID, rome("02:30"), first)
+    assert local(first).strftime("%m-%d %H:%M") == "10-25 02:30"
+    assert local(second).strftime("%m-%d %H:%M") == "10-26 02:30"
+
+
+def test_last_fire_is_latest_at_or_before():
+    subscription = rome("08:00")
+    assert main.last_daily_fire(GUILD_ID, subscription, at(2026, 10, 13, 12)) == at(2026, 10, 13, 8)
+    assert main.last_daily_fire(GUILD_ID, subscription, at(2026, 10, 13, 8)) == at(2026, 10, 13, 8)
+    assert main.last_daily_fire(GUILD_ID, subscription, at(2026, 10, 13, 7, 59)) == at(2026, 10, 12, 8)
+    # Across the spring-forward night
+    assert main.last_daily_fire(GUILD_ID, subscription, at(2026, 3, 29, 7)) == at(2026, 3, 28, 8)
+
+
+class FakeDailyStore:
+    def __init__(self, rows: dict):
+        self.rows = dict(rows)
+        self.writes = {}
+
+    async def items(self):
+        return list(self.rows.items())
+
+    async def get(self, key, default=None):
+        return self.rows.get(key, default)
+
+    def set(self, key, value):
+        self.writes[key] = value
+
+
+@pytest.fixture
+def daily(monkeypatch):
+    schedule = main.DailySchedule()
+    monkeypatch.setattr(main, "daily_schedule", schedule)
+
+    def use(rows: dict, now: float, guilds=()):
+        store = FakeDailyStore(rows)
+        monkeypatch.setattr(main, "daily_store", store)
+        monkeypatch.setattr(main.time, "time", lambda: now)
+        monkeypatch.setattr(main.bot, "get_guild", lambda guild_id: SimpleNamespace(id=guild_id) if guild_id in guilds else None)
+        return store
+
+    return SimpleNamespace(schedule=schedule, use=use)
+
+
+def scheduled(schedule, guild_id) -> float:
+    return schedule._next[guild_id][0]
+
+
+def test_startup_catches_up_latest_missed_firing(daily):
+    now = at(2026, 10, 13, 12)
+    daily.use({
+        GUILD_ID: rome("08:00", last_fired=at(2026, 10, 10, 8)),  # offline for three days
+        GUILD_ID + 1: rome("08:00", last_fired=at(2026, 10, 13, 8) + 1),  # already sent today
+        GUILD_ID + 2: main.DailySubscription(None, "08:00"),  # unsubscribed
+    }, now)
+    asyncio.run(main.load_daily_subscriptions())
+    assert scheduled(daily.schedule, GUILD_ID) == at(2026, 10, 13, 8)
+    assert scheduled(daily.schedule, GUILD_ID + 1) == at(2026, 10, 14, 8) + 1
+    assert len(daily.schedule) == 2
+
+
+def test_missing_guild_stays_scheduled(daily):
+    now = at(2026, 10, 13, 8, 0) + 5
+    store = daily.use({}, now, guilds=())
+    subscription = rome("08:00", last_fired=at(2026, 10, 12, 8))
+    daily.schedule.add_at(GUILD_ID, subscription, at(2026, 10, 13, 8))
+
+    asyncio.run(main.daily_quotes.coro())
+    assert scheduled(daily.schedule, GUILD_ID) == at(2026, 10, 14, 8)
+    assert store.writes == {}  # nothing was sent, so last_fired is unchanged
+
+
+def test_rejoining_guild_is_rescheduled(daily):
+    now = at(2026, 10, 13, 12)
+    daily.use({GUILD_ID: rome("08:00", last_fired=at(2026, 10, 13, 8))}, now)
+    guild = SimpleNamespace(id=GUILD_ID, text_channels=[])
+    asyncio.run(main.on_guild_join(guild))
+    assert scheduled(daily.schedule, GUILD_ID) == at(2026, 10, 14, 8)
@@ -0,0 +1,25 @@
+import main
+
+
+def authors_index(count: int, name_length: int = 10) -> main.QuoteIndex:
+    corpus = {f"{i:03d}".ljust(name_length, "x"): [f"Quote {i} " * 30] for i in range(count)}
+    return main.QuoteIndex.build(corpus, 1)
+
+
+def test_authors_embed_lists_small_corpus_in_full():
+    embed = main.build_authors_embed(authors_index(main.EMBED_MAX_FIELDS))
+    assert len(embed.fields) == main.EMBED_MAX_FIELDS
+    assert "more" not in embed.fields[-1].name
+
+
+def test_authors_embed_stops_at_field_limit():
+    embed = main.build_authors_embed(authors_index(60))
+    assert len(embed.fields) == main.EMBED_MAX_FIELDS
+    assert embed.fields[-1].name == "…and 36 more"
+
+
+def test_authors_embed_stops_at_size_limit():
+    embed = main.build_authors_embed(authors_index(20, name_length=400))
+    assert all(len(field.name) <= main.EMBED_MAX_FIELD_NAME for field in embed.fields)
+    assert len(embed) <= main.EMBED_MAX_CHARS - 256
+    assert embed.fields[-1].name.startswith("…and ")
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+import main
+
+GUILD_ID = 81384788765712384
+APPLICATION_ID = 1234
+
+
+def guild_data(guild_id: int = GUILD_ID) -> dict:
+    return {
+        "id": str(guild_id),
+        "name": "Stoa",
+        "owner_id": "1",
+        "member_count": 3,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "2048", "position": 0,
+                   "colors": {"primary_color": 0}}],
+        "channels": [{"id": "42", "type": 0, "name": "general", "position": 0, "parent_id": None}],
+    }
+
+
+@pytest.fixture
+def gateway(monkeypatch, tmp_path):
+    """A bot with one cached guild and a connected websocket, and a fake DiscordWebSocket.from_client."""
+    connection = main.bot._connection
+    for guild in list(connection.guilds):
+        connection._remove_guild(guild)
+    connection._add_guild_from_data(guild_data())
+    monkeypatch.setattr(connection, "application_id", APPLICATION_ID)
+
+    ws = SimpleNamespace(session_id="abc", sequence=17, resume_gateway_url="wss://resume.example")
+    monkeypatch.setattr(main, "gateway_websockets", lambda: {0: ws})
+    monkeypatch.setattr(main, "pending_resumes", {})
+    monkeypatch.setattr(main, "restored_shards", set())
+
+    connects = []
+
+    async def from_client(cls, client, *, shard_id=None, resume=False, **params):
+        connects.append({"shard_id": shard_id, "resume": resume, **params})
+
+    monkeypatch.setattr(main, "_from_client", classmethod(from_client))
+    monkeypatch.setattr(discord.gateway.DiscordWebSocket, "from_client", main._from_client)
+    yield SimpleNamespace(path=str(tmp_path / "sessions.json"), connects=connects)
+    for guild in list(connection.guilds):
+        connection._remove_guild(guild)
+
+
+def restart(connection):
+    """Forget what the last run had cached, as a fresh process would."""
+    for guild in list(connection.guilds):
+        connection._remove_guild(guild)
+    connection.application_id = None
+
+
+def test_capture_save_restore_round_trip(gateway):
+    state = main.capture_gateway_state()
+    main.save_gateway_state(gateway.path, state)
+    restart(main.bot._connection)
+
+    assert main.restore_gateway_state(gateway.path) == 1
+    assert main.pending_resumes == {0: {"session_id": "abc", "sequence": 17,
+                                        "resume_gateway_url": "wss://resume.example"}}
+    guild = main.bot.get_guild(GUILD_ID)
+    assert guild is not None and guild.get_channel(42).name == "general"
+    assert guild.default_role.permissions.send_messages
+    assert main.bot._connection.application_id == APPLICATION_ID
+
+    # The first connection resumes the saved session
+    asyncio.run(discord.gateway.DiscordWebSocket.from_client(main.bot))
+    connect = gateway.connects[-1]
+    assert connect["resume"] and connect["session"] == "abc" and connect["sequence"] == 17
+    assert connect["gateway"].startswith("wss://resume.example?")
+
+    # Discord rejected it: py-cord reconnects without resume, and the restored guilds are dropped
+    asyncio.run(discord.gateway.DiscordWebSocket.from_client(main.bot))
+    assert not gateway.connects[-1]["resume"]
+    assert main.bot.get_guild(GUILD_ID) is None
+
+
+def test_state_is_used_once(gateway):
+    main.save_gateway_state(gateway.path, main.capture_gateway_state())
+    assert main.take_gateway_state(gateway.path) is not None
+    assert main.take_gateway_state(gateway.path) is None
+
+
+def test_expired_state_is_discarded(gateway):
+    state = main.capture_gateway_state()
+    state["saved_at"] = time.time() - main.GATEWAY_RESUME_MAX_AGE - 1
+    main.save_gateway_state(gateway.path, state)
+    assert main.restore_gateway_state(gateway.path) == 0
+
+
+@pytest.mark.parametrize("state", [
+    {"saved_at": 0},  # no format: written by an older version
+    [],
+    {"format": main.GATEWAY_STATE_FORMAT, "saved_at": "now"},
+    {"format": main.GATEWAY_STATE_FORMAT, "saved_at": time.time(), "shard_count": None, "application_id": 1,
+     "sessions": {"0": {"session_id": "abc"}}, "guilds": []},
+    {"format": main.GATEWAY_STATE_FORMAT, "saved_at": time.time(), "shard_count": None, "application_id": 1,
+     "sessions": {"0": {"session_id": "abc", "sequence": 1, "resume_gateway_url": "wss://resume.example"}},
+     "guilds": [{"name": "no id"}]},
+])
+def test_malformed_state_is_discarded(gateway, state):
+    with open(gateway.path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    assert main.restore_gateway_state(gateway.path) == 0
+    assert main.pending_resumes == {}
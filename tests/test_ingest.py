@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import pytest
+
+import main
+
+
+def parse(data: bytes, chunk_size: int) -> list:
+    async def chunks():
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    async def collect():
+        return [item async for item in main.iter_json_array(chunks())]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1024])
+def test_numbers_split_across_chunks(chunk_size):
+    assert parse(b"[12345, 678]", chunk_size) == [12345, 678]
+    assert parse(b"[1.5e10,-2,0]", chunk_size) == [1.5e10, -2, 0]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 1024])
+def test_records_split_across_chunks(chunk_size):
+    records = [{"author": "Seneca", "text": "Luck is what happens when preparation meets opportunity."},
+               {"author": "Épictète", "text": "Ça dépend de nous — “quotes”, [brackets], and \\\"escapes\\\"."},
+               True, None, "tail"]
+    assert parse(json.dumps(records).encode("utf-8"), chunk_size) == records
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+def test_empty_array(chunk_size):
+    assert parse(b" [ ] ", chunk_size) == []
+
+
+@pytest.mark.parametrize("data", [b"[1, 2", b"[12345", b'[{"author": "Seneca"'])
+def test_truncated_array_raises(data):
+    with pytest.raises(ValueError, match="truncated"):
+        parse(data, 2)
+
+
+def test_non_array_raises():
+    with pytest.raises(ValueError, match="expected a JSON array"):
+        parse(b'{"author": "Seneca"}', 4)
+
+
+def test_malformed_element_raises():
+    with pytest.raises(ValueError, match="malformed"):
+        parse(b"[1x, 2]", 1024)
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    """An "api" source serving whatever `api` holds, and a JSONL file source written by `write_file`."""
+    path = tmp_path / "quotes.jsonl"
+    api = []
+
+    async def fake_api_page(ingestor, page, conditional=True):
+        return sum(ingestor.add("Seneca", text) for text in api), None
+
+    def write_file(texts):
+        path.write_text("".join(json.dumps({"author": "Seneca", "text": t}) + "\n" for t in texts))
+
+    monkeypatch.setattr(main, "ingest_api_page", fake_api_page)
+    monkeypatch.setattr(main, "QUOTE_SOURCES", ["api", str(path)])
+    monkeypatch.setattr(main, "QUOTE_API_PAGES", 1)
+    monkeypatch.setattr(main, "QUOTE_SNAPSHOT_PATH", str(tmp_path / "quotes.snapshot"))
+    monkeypatch.setattr(main, "quotes_by_author", {})
+    monkeypatch.setattr(main, "file_quote_hashes", set())
+    monkeypatch.setattr(main, "quotes_etag", None)
+    monkeypatch.setattr(main, "quote_index", main.QuoteIndex.build({}, 0))
+    return api, write_file, path
+
+
+def seneca() -> set[str]:
+    return set(main.quotes_by_author.get("Seneca", []))
+
+
+def test_reload_rebuilds_files_but_keeps_api_samples(sources):
+    api, write_file, _ = sources
+    api[:] = ["api one"]
+    write_file(["file one", "file two"])
+    asyncio.run(main.fetch_quotes())
+    api[:] = ["api two"]
+    asyncio.run(main.fetch_quotes())
+    assert seneca() == {"api one", "api two", "file one", "file two"}
+
+    api[:] = ["api three"]
+    write_file(["file two", "file three"])
+    assert asyncio.run(main.fetch_quotes(force=True))
+    # Earlier API samples survive; the quote removed from the file is gone
+    assert seneca() == {"api one", "api two", "api three", "file two", "file three"}
+
+
+def test_reload_keeps_corpus_when_a_file_fails(sources):
+    api, write_file, path = sources
+    api[:] = ["api one"]
+    write_file(["file one"])
+    asyncio.run(main.fetch_quotes())
+    os.remove(path)
+    with pytest.raises(ValueError, match="could not ingest"):
+        asyncio.run(main.fetch_quotes(force=True))
+    assert seneca() == {"api one", "file one"}
+
+
+def test_file_provenance_survives_a_restart(sources):
+    api, write_file, _ = sources
+    api[:] = ["api one"]
+    write_file(["file one"])
+    asyncio.run(main.fetch_quotes())
+
+    main.quotes_by_author, main.file_quote_hashes = {}, set()
+    assert main.load_snapshot()
+    assert main.file_quote_hashes == {main.quote_hash("file one")}
+
+    api[:] = []
+    write_file(["file two"])
+    asyncio.run(main.fetch_quotes(force=True))
+    assert seneca() == {"api one", "file two"}
+
+
+def test_format_1_snapshot_loads_without_flags():
+    corpus = {"Seneca": ["one", "two"]}
+    data = bytearray(main.encode_snapshot(corpus, "etag", {main.quote_hash("one")}))
+    # Rewrite as format 1: same layout without the flag bytes before the blob
+    etag, version, ranges, offsets, flags, pos = main.parse_snapshot_layout(bytes(data))
+    legacy = data[:pos - len(flags)] + data[pos:]
+    legacy[4:6] = (1).to_bytes(2, "little")
+    assert main.decode_snapshot(bytes(legacy)) == (corpus, "etag", version, set())
+
+
+def test_shared_reader_waits_for_new_snapshot(tmp_path, monkeypatch):
+    path = tmp_path / "quotes.snapshot"
+    main.write_snapshot(str(path), {"Seneca": ["one"]})
+    monkeypatch.setattr(main, "QUOTE_SNAPSHOT_PATH", str(path))
+    monkeypatch.setattr(main, "SHARED_RELOAD_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(main, "snapshot_mtime", os.stat(path).st_mtime_ns)
+    monkeypatch.setattr(main, "quote_index", main.quote_index)
+    monkeypatch.setattr(main, "quotes_etag", main.quotes_etag)
+
+    # Nothing rewrote the snapshot: don't re-map the old one and claim a reload
+    assert not asyncio.run(main.wait_for_shared_snapshot(0.05))
+
+    async def rewrite_later():
+        await asyncio.sleep(0.03)
+        main.write_snapshot(str(path), {"Seneca": ["one", "two"]})
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    async def scenario():
+        writer = asyncio.create_task(rewrite_later())
+        loaded = await main.wait_for_shared_snapshot(1.0)
+        await writer
+        return loaded
+
+    assert asyncio.run(scenario())
+    assert main.quote_index.total == 2
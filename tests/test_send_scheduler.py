@@ -0,0 +1,40 @@
+import asyncio
+
+import main
+
+
+def test_drain_cancels_in_flight_send():
+    async def run():
+        scheduler = main.SendScheduler(channel_rate=100.0, channel_burst=5, global_rate=100.0)
+
+        async def stalled_send(**kwargs):
+            await asyncio.sleep(60)
+
+        sender = asyncio.ensure_future(scheduler.send(1, stalled_send))
+        await asyncio.sleep(0.01)  # let the drain task start the send
+
+        assert await scheduler.drain(0.01) == 1
+        # The handler awaiting the send is released instead of hanging
+        done, _ = await asyncio.wait({sender}, timeout=1.0)
+        assert done and sender.cancelled()
+
+    asyncio.run(run())
+
+
+def test_drain_counts_queued_messages():
+    async def run():
+        scheduler = main.SendScheduler(channel_rate=0.001, channel_burst=1, global_rate=100.0)
+        sent = []
+
+        async def record(**kwargs):
+            sent.append(kwargs)
+
+        senders = [asyncio.ensure_future(scheduler.send(1, record, n=n)) for n in range(3)]
+        await asyncio.sleep(0.01)
+
+        assert await scheduler.drain(0.01) == 2
+        assert len(sent) == 1
+        results = await asyncio.gather(*senders, return_exceptions=True)
+        assert sum(isinstance(r, asyncio.CancelledError) for r in results) == 2
+
+    asyncio.run(run())
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+import main
+
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+
+class FakeContext(discord.ApplicationContext):
+    """Interaction context whose responses take `delay` seconds to reach Discord."""
+
+    def __init__(self, delay: float = 0.0, defer_error: Exception | None = None):
+        self._fake_interaction = SimpleNamespace(id=1, response=FakeResponse())
+        self.delay = delay
+        self.defer_error = defer_error
+        self.calls = []
+
+    @property
+    def interaction(self):
+        return self._fake_interaction
+
+    @property
+    def command(self):
+        return SimpleNamespace(qualified_name="quote")
+
+    async def respond(self, content=None, **kwargs):
+        self.calls.append(("respond", content, kwargs))
+        await asyncio.sleep(self.delay)
+        self.interaction.response.done = True
+
+    async def defer(self, **kwargs):
+        self.calls.append(("defer", None, kwargs))
+        if self.defer_error is not None:
+            raise self.defer_error
+        self.interaction.response.done = True
+
+
+def run_slash(ctx, callback, monkeypatch, defer_after=0.01):
+    monkeypatch.setattr(main, "SLASH_DEFER_AFTER", defer_after)
+    command = SimpleNamespace(callback=callback, qualified_name="quote")
+    asyncio.run(main.run_slash(ctx, command))
+
+
+def test_slow_command_is_deferred_before_replying(monkeypatch):
+    ctx = FakeContext()
+
+    async def slow(ctx):
+        await asyncio.sleep(0.05)
+        await main.reply(ctx, "done")
+
+    run_slash(ctx, slow, monkeypatch)
+    assert [call[0] for call in ctx.calls] == ["defer", "respond"]
+
+
+def test_reply_in_flight_is_not_deferred(monkeypatch):
+    # The timer fires while respond() is still waiting on Discord
+    ctx = FakeContext(delay=0.05)
+
+    async def quick(ctx):
+        await main.reply(ctx, "done")
+
+    run_slash(ctx, quick, monkeypatch)
+    assert [call[0] for call in ctx.calls] == ["respond"]
+    assert main.answering_interactions == set()
+
+
+def test_failed_deferral_is_retrieved(monkeypatch):
+    ctx = FakeContext(defer_error=discord.InteractionResponded(None))
+    unhandled = []
+
+    async def slow(ctx):
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        await asyncio.sleep(0.05)
+        await main.reply(ctx, "done")
+
+    run_slash(ctx, slow, monkeypatch)
+    assert [call[0] for call in ctx.calls] == ["defer", "respond"]
+    assert unhandled == []
+    assert main.pending_defers == {}
+
+
+def test_failed_slash_command_gets_an_ephemeral_error(monkeypatch):
+    ctx = FakeContext()
+    monkeypatch.setattr(main, "count_command_error", lambda ctx, error: None)
+    asyncio.run(main.on_application_command_error(ctx, RuntimeError("boom")))
+    (kind, content, kwargs), = ctx.calls
+    assert kind == "respond" and content.startswith("❌") and kwargs == {"ephemeral": True}
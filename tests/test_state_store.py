@@ -0,0 +1,192 @@
+import asyncio
+import socketserver
+import threading
+import time
+
+import pytest
+
+import main
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough RESP (AUTH, SELECT, HGET, HSET, HGETALL) to stand in for Redis."""
+
+    def read_command(self) -> list[bytes] | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b"*"
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        db, authenticated = 0, self.server.password is None
+        while (command := self.read_command()) is not None:
+            name, args = command[0].upper(), command[1:]
+            hashes = self.server.dbs.setdefault(db, {})
+            if name == b"AUTH":
+                authenticated = args[-1] == self.server.password and args[:-1] in ([], [b"default"], [b"bot"])
+                self.server.auth_calls.append(args)
+                self.wfile.write(b"+OK\r\n" if authenticated else b"-WRONGPASS invalid username-password pair\r\n")
+            elif not authenticated:
+                self.wfile.write(b"-NOAUTH Authentication required.\r\n")
+            elif name == b"SELECT":
+                db = int(args[0])
+                self.wfile.write(b"+OK\r\n")
+            elif name == b"HGET":
+                value = hashes.get(args[0], {}).get(args[1])
+                self.wfile.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value))
+            elif name == b"HSET":
+                table = hashes.setdefault(args[0], {})
+                pairs = dict(zip(args[1::2], args[2::2]))
+                added = len(pairs.keys() - table.keys())
+                table.update(pairs)
+                self.wfile.write(b":%d\r\n" % added)
+            elif name == b"HGETALL":
+                items = [part for pair in hashes.get(args[0], {}).items() for part in pair]
+                self.wfile.write(b"*%d\r\n" % len(items) + b"".join(b"$%d\r\n%s\r\n" % (len(p), p) for p in items))
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RespHandler)
+    server.daemon_threads = True
+    server.dbs = {}
+    server.password = None
+    server.auth_calls = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def redis_backend(server, table="personas", db=0, credentials="") -> main.RedisBackend:
+    host, port = server.server_address
+    return main.open_store_backend(f"redis://{credentials}{host}:{port}/{db}", table)
+
+
+def test_redis_backend_round_trip(resp_server):
+    backend = redis_backend(resp_server, db=2)
+    assert backend.get(1) is None
+    backend.save_many({1: "Seneca", 2: "Epictetus"})
+    backend.save_many({1: "Marcus Aurelius"})
+    assert backend.get(1) == "Marcus Aurelius"
+    assert sorted(backend.items()) == [(1, "Marcus Aurelius"), (2, "Epictetus")]
+    assert resp_server.dbs[2][b"stoic:personas"][b"2"] == b"Epictetus"
+    backend.close()
+
+
+def test_redis_backend_reconnects(resp_server):
+    backend = redis_backend(resp_server)
+    backend.save_many({7: "Seneca"})
+    backend._sock.close()  # simulate a dropped connection
+    assert backend.get(7) == "Seneca"
+    backend.close()
+
+
+def test_redis_backend_authenticates(resp_server):
+    resp_server.password = b"s3cr/t"
+    backend = redis_backend(resp_server, db=1, credentials="default:s3cr%2Ft@")
+    backend.save_many({1: "Seneca"})
+    assert backend.get(1) == "Seneca"
+    backend.close()
+
+    named = redis_backend(resp_server, db=1, credentials="bot:s3cr%2Ft@")
+    assert named.get(1) == "Seneca"
+    named.close()
+    # "default" logs in with the password alone, which pre-ACL servers also accept
+    assert resp_server.auth_calls == [[b"s3cr/t"], [b"bot", b"s3cr/t"]]
+
+
+def test_redis_backend_without_credentials_is_refused(resp_server):
+    resp_server.password = b"s3cr/t"
+    backend = redis_backend(resp_server)
+    with pytest.raises(RuntimeError, match="NOAUTH"):
+        backend.get(1)
+    backend.close()
+
+
+def test_rediss_url_uses_tls():
+    backend = main.open_store_backend("rediss://:pw@example.com:6380/3", "personas")
+    assert (backend.tls, backend.password, backend.username, backend.db) == (True, "pw", None, 3)
+
+
+def test_store_get_survives_backend_errors(resp_server):
+    resp_server.password = b"s3cr/t"
+
+    async def scenario():
+        store = main.WriteBehindStore(redis_backend(resp_server))
+        assert await store.get(1, "default") == "default"
+        assert store._cached(1) is None  # the failure isn't cached as a miss
+        store.backend.close()
+        store.backend.password = "s3cr/t"
+        store.backend.save_many({1: "Seneca"})
+        assert await store.get(1, "default") == "Seneca"
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_store_shared_between_processes(resp_server):
+    """Two stores on one backend stand in for two shard workers."""
+    async def scenario():
+        worker0 = main.WriteBehindStore(redis_backend(resp_server), ttl=0.05)
+        worker1 = main.WriteBehindStore(redis_backend(resp_server), ttl=0.05)
+        assert await worker1.get(42) is None  # cached miss on worker 1
+        worker0.set(42, "Seneca")
+        await worker0.flush()
+        assert await worker1.get(42) is None  # still within the ttl
+        await asyncio.sleep(0.06)
+        assert await worker1.get(42) == "Seneca"
+        for store in (worker0, worker1):
+            await store.close()
+
+    asyncio.run(scenario())
+
+
+class SlowBackend:
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, key):
+        time.sleep(0.05)
+        return self.rows.get(key)
+
+    def save_many(self, items):
+        self.rows.update(items)
+
+    def items(self):
+        return list(self.rows.items())
+
+    def close(self):
+        pass
+
+
+def test_set_during_backend_read_wins():
+    async def scenario():
+        store = main.WriteBehindStore(SlowBackend())
+        loading = asyncio.create_task(store.get(42))
+        await asyncio.sleep(0.01)
+        store.set(42, "Seneca")
+        assert await loading == "Seneca"
+        assert await store.get(42) == "Seneca"
+
+    asyncio.run(scenario())
+
+
+def test_store_without_ttl_keeps_cache():
+    async def scenario():
+        backend = SlowBackend()
+        store = main.WriteBehindStore(backend)
+        assert await store.get(1, "default") == "default"
+        backend.rows[1] = "Seneca"
+        assert await store.get(1, "default") == "default"
+        assert store.hits == 1 and store.misses == 1
+
+    asyncio.run(scenario())